@@ -1,7 +1,11 @@
 import os
+import math
 import pytz
 
 import datetime
+import logging
+import threading
+import contextlib
 
 import matplotlib.pyplot as plt
 import matplotlib.dates as mdates
@@ -10,36 +14,113 @@ import cartopy
 import cartopy.crs as ccrs
 import cartopy.feature as cfeature
 
+import numpy as np
+
 import netCDF4 as nc4
 
 from kartverket_stormsurge.helper.raise_assert import ras
 from kartverket_stormsurge.helper.datetimes import assert_is_utc_datetime
 
-from kartverket_stormsurge.helper.arrays import find_index_first_greater_or_equal
+from kartverket_stormsurge.helper.arrays import SortedArrayIndex
 
 
 class DatasetAccessor():
-    def __init__(self, path_to_NetCDF=None):
+    def __init__(self, path_to_NetCDF=None, keep_open=False):
+        """
+        Input:
+            - path_to_NetCDF: the path to the netCDF4 dump. If None (default), use
+                data_kartverket_storm_surge.nc4 in the current directory.
+            - keep_open: if False (default), the netCDF4 file is opened and closed again
+                at each access. If True, keep one open file handle per thread for the
+                whole lifetime of the accessor, to avoid paying the opening overhead
+                on each call; the handles are released with close(), or by using the
+                accessor as a context manager.
+        """
         if path_to_NetCDF is None:
             self.path_to_NetCDF = os.getcwd() + "/data_kartverket_storm_surge.nc4"
         else:
             self.path_to_NetCDF = path_to_NetCDF
 
+        self.keep_open = keep_open
+        self.closed = False
+
+        # only used for datasets with a non regular time base, built on first use
+        self.timestamps_index = None
+
+        # netCDF4 / HDF5 file handles should not be shared between threads, so keep one per thread
+        self.thread_local_handles = threading.local()
+        self.list_open_handles = []
+        self.lock_open_handles = threading.Lock()
+
         self.explore_information()
 
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        """Close all the file handles kept open; the accessor cannot be used any longer after this."""
+        with self.lock_open_handles:
+            for crrt_handle in self.list_open_handles:
+                if crrt_handle.isopen():
+                    crrt_handle.close()
+
+            self.list_open_handles = []
+            self.closed = True
+
+    @contextlib.contextmanager
+    def open_dataset(self):
+        """Context manager providing a readable handle to the netCDF4 dump. Depending on
+        keep_open, this is either a fresh handle closed on exit, or the persistent
+        handle of the current thread."""
+        ras(not self.closed, "the DatasetAccessor on {} is closed".format(self.path_to_NetCDF))
+
+        if not self.keep_open:
+            with nc4.Dataset(self.path_to_NetCDF, "r", format="NETCDF4") as nc4_fh:
+                yield nc4_fh
+
+        else:
+            nc4_fh = getattr(self.thread_local_handles, "nc4_fh", None)
+
+            if nc4_fh is None or not nc4_fh.isopen():
+                nc4_fh = nc4.Dataset(self.path_to_NetCDF, "r", format="NETCDF4")
+                self.thread_local_handles.nc4_fh = nc4_fh
+
+                with self.lock_open_handles:
+                    self.list_open_handles.append(nc4_fh)
+
+            yield nc4_fh
+
     def explore_information(self):
-        with nc4.Dataset(self.path_to_NetCDF, "r", format="NETCDF4") as nc4_fh:
+        with self.open_dataset() as nc4_fh:
             self.station_ids = nc4_fh["stationid"][:]
             self.number_of_stations = len(self.station_ids)
+            self.number_of_timestamps = len(nc4_fh.dimensions["time"])
             self.first_timestamp = int(nc4_fh["timestamps"][0])
             self.last_timestamp = int(nc4_fh["timestamps"][-1])
 
+            if self.number_of_timestamps > 1:
+                self.time_step = int(nc4_fh["timestamps"][1]) - self.first_timestamp
+            else:
+                self.time_step = None
+
+        # the datasets generated by DatasetGenerator use a regular time base; in this case, indexes can be
+        # computed arithmetically instead of searching through the full timestamps vector.
+        self.regular_time_base = self.time_step is not None and self.time_step > 0 and\
+            self.last_timestamp == self.first_timestamp + (self.number_of_timestamps - 1) * self.time_step
+
+        if not self.regular_time_base:
+            logging.warning("the time base of {} is not regular, get_data will use slower full reads"
+                            .format(self.path_to_NetCDF))
+
         self.dict_metadata = self.get_dict_stations_metadata()
 
     def get_dict_stations_metadata(self):
         dict_stations_metadata = {}
 
-        with nc4.Dataset(self.path_to_NetCDF, "r", format="NETCDF4") as nc4_fh:
+        with self.open_dataset() as nc4_fh:
             for crrt_ind in range(self.number_of_stations):
                 crrt_station_id = nc4_fh["stationid"][crrt_ind]
                 crrt_lat = nc4_fh["latitude"][crrt_ind]
@@ -225,17 +306,45 @@ class DatasetAccessor():
         timestamp_start = datetime_start.timestamp()
         timestamp_end = datetime_end.timestamp()
 
-        with nc4.Dataset(self.path_to_NetCDF, "r", format="NETCDF4") as nc4_fh:
-            data_timestamp_full = nc4_fh["timestamps"][:]
-            data_observation_full = nc4_fh["observation"][nc4_index][:]
-            data_prediction_full = nc4_fh["prediction"][nc4_index][:]
+        first_index, last_index = self.get_time_indexes(timestamp_start, timestamp_end)
 
-        first_index = find_index_first_greater_or_equal(data_timestamp_full, timestamp_start)
-        last_index = find_index_first_greater_or_equal(data_timestamp_full, timestamp_end) + 1
+        # only read the hyperslab that is needed, not the full station row
+        with self.open_dataset() as nc4_fh:
+            data_timestamp = nc4_fh["timestamps"][first_index:last_index]
+            data_observation = nc4_fh["observation"][nc4_index, first_index:last_index]
+            data_prediction = nc4_fh["prediction"][nc4_index, first_index:last_index]
 
         data_datetime = [datetime.datetime.fromtimestamp(crrt_timestamp, pytz.utc) for
-                         crrt_timestamp in data_timestamp_full[first_index:last_index]]
-        data_observation = data_observation_full[first_index:last_index]
-        data_prediction = data_prediction_full[first_index:last_index]
+                         crrt_timestamp in data_timestamp]
 
         return(data_datetime, data_observation, data_prediction)
+
+    def get_time_indexes(self, timestamp_start, timestamp_end, tol=1e-6):
+        """Get the range of indexes on the time base that cover [timestamp_start; timestamp_end].
+        Input:
+            - timestamp_start, timestamp_end: POSIX timestamps of the limits of the range.
+            - tol: a tolerance for performing the comparisons.
+        Output:
+            - (first_index, last_index): first_index is the index of the first timestamp that is greater
+                or equal to timestamp_start, last_index is one past the index of the first timestamp that
+                is greater or equal to timestamp_end, i.e. the range is ready for slicing.
+        If timestamp_end is after the last timestamp of the dataset, raise a ValueError.
+        """
+
+        if self.regular_time_base:
+            if self.last_timestamp < timestamp_end:
+                raise ValueError("no entry greater or equal than the asked value")
+
+            first_index = max(0, math.ceil((timestamp_start - self.first_timestamp - tol) / self.time_step))
+            last_index = max(0, math.ceil((timestamp_end - self.first_timestamp - tol) / self.time_step)) + 1
+
+        else:
+            if self.timestamps_index is None:
+                with self.open_dataset() as nc4_fh:
+                    self.timestamps_index = SortedArrayIndex(np.asarray(nc4_fh["timestamps"][:]))
+
+            first_index, last_index = self.timestamps_index.find_index_first_greater_or_equal(
+                [timestamp_start, timestamp_end], tol=tol)
+            last_index += 1
+
+        return(first_index, last_index)
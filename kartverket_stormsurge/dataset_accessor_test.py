@@ -0,0 +1,167 @@
+"""Tests of the DatasetAccessor against a small synthetic netCDF4 dump, so that
+no API request is needed."""
+
+import os
+import tempfile
+import threading
+import datetime
+import numpy as np
+import pytz
+import netCDF4 as nc4
+
+import pytest
+
+from kartverket_stormsurge.dataset_accessor import DatasetAccessor
+from kartverket_stormsurge.helper.synthetic_dataset import write_synthetic_netCDF4_dump, synthetic_water_levels
+
+
+def get_reference_data(station_id, datetime_start, datetime_end):
+    """The data get_data should return, computed independently of the dump."""
+    crrt_datetime = datetime_start
+    list_datetimes = []
+    while crrt_datetime <= datetime_end:
+        list_datetimes.append(crrt_datetime)
+        crrt_datetime += datetime.timedelta(minutes=10)
+
+    np_timestamps = np.array([crrt_datetime.timestamp() for crrt_datetime in list_datetimes])
+    np_observation, np_prediction = synthetic_water_levels(station_id, np_timestamps)
+
+    return(list_datetimes, np_observation, np_prediction)
+
+
+def test_get_data_synthetic():
+    datetime_start_dump = datetime.datetime(2008, 1, 1, 0, 0, 0, 0, pytz.utc)
+    datetime_end_dump = datetime.datetime(2008, 3, 1, 0, 0, 0, 0, pytz.utc)
+
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        nc4_path = os.path.join(tmpdirname, "synthetic.nc4")
+        write_synthetic_netCDF4_dump(nc4_path, ["AAA", "BBB", "CCC"], datetime_start_dump, datetime_end_dump)
+
+        dataset_accessor = DatasetAccessor(path_to_NetCDF=nc4_path)
+        assert dataset_accessor.regular_time_base
+
+        for crrt_station, datetime_start, datetime_end in [
+            ("AAA", datetime.datetime(2008, 1, 15, 9, 0, 0, 0, pytz.utc),
+             datetime.datetime(2008, 1, 15, 10, 0, 0, 0, pytz.utc)),
+            ("BBB", datetime.datetime(2008, 1, 10, 0, 0, 0, 0, pytz.utc),
+             datetime.datetime(2008, 2, 10, 0, 0, 0, 0, pytz.utc)),
+            ("CCC", datetime.datetime(2008, 2, 1, 0, 0, 0, 0, pytz.utc),
+             datetime.datetime(2008, 2, 1, 0, 0, 0, 0, pytz.utc)),
+        ]:
+            data_datetime, data_observation, data_prediction =\
+                dataset_accessor.get_data(crrt_station, datetime_start, datetime_end)
+
+            correct_datetime, correct_observation, correct_prediction =\
+                get_reference_data(crrt_station, datetime_start, datetime_end)
+
+            assert data_datetime == correct_datetime
+            assert np.allclose(correct_observation, data_observation)
+            assert np.allclose(correct_prediction, data_prediction)
+
+
+def test_get_data_off_grid_and_bounds():
+    datetime_start_dump = datetime.datetime(2008, 1, 1, 0, 0, 0, 0, pytz.utc)
+    datetime_end_dump = datetime.datetime(2008, 1, 2, 0, 0, 0, 0, pytz.utc)
+
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        nc4_path = os.path.join(tmpdirname, "synthetic.nc4")
+        write_synthetic_netCDF4_dump(nc4_path, ["AAA"], datetime_start_dump, datetime_end_dump)
+
+        dataset_accessor = DatasetAccessor(path_to_NetCDF=nc4_path)
+
+        # the first timestamp greater or equal to the end is included
+        data_datetime, _, _ =\
+            dataset_accessor.get_data("AAA",
+                                      datetime.datetime(2008, 1, 1, 9, 5, 0, 0, pytz.utc),
+                                      datetime.datetime(2008, 1, 1, 9, 25, 0, 0, pytz.utc))
+
+        assert data_datetime == [datetime.datetime(2008, 1, 1, 9, 10, 0, 0, pytz.utc),
+                                 datetime.datetime(2008, 1, 1, 9, 20, 0, 0, pytz.utc),
+                                 datetime.datetime(2008, 1, 1, 9, 30, 0, 0, pytz.utc)]
+
+        # a start before the beginning of the dump is clipped
+        data_datetime, _, _ =\
+            dataset_accessor.get_data("AAA",
+                                      datetime.datetime(2007, 12, 31, 0, 0, 0, 0, pytz.utc),
+                                      datetime.datetime(2008, 1, 1, 0, 10, 0, 0, pytz.utc))
+
+        assert data_datetime == [datetime.datetime(2008, 1, 1, 0, 0, 0, 0, pytz.utc),
+                                 datetime.datetime(2008, 1, 1, 0, 10, 0, 0, pytz.utc)]
+
+        # an end after the end of the dump is an error
+        with pytest.raises(ValueError):
+            dataset_accessor.get_data("AAA",
+                                      datetime.datetime(2008, 1, 1, 23, 0, 0, 0, pytz.utc),
+                                      datetime.datetime(2008, 1, 3, 0, 0, 0, 0, pytz.utc))
+
+
+def test_get_data_keep_open():
+    datetime_start_dump = datetime.datetime(2008, 1, 1, 0, 0, 0, 0, pytz.utc)
+    datetime_end_dump = datetime.datetime(2008, 2, 1, 0, 0, 0, 0, pytz.utc)
+    datetime_start = datetime.datetime(2008, 1, 15, 9, 0, 0, 0, pytz.utc)
+    datetime_end = datetime.datetime(2008, 1, 16, 9, 0, 0, 0, pytz.utc)
+
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        nc4_path = os.path.join(tmpdirname, "synthetic.nc4")
+        write_synthetic_netCDF4_dump(nc4_path, ["AAA", "BBB"], datetime_start_dump, datetime_end_dump)
+
+        correct_datetime, correct_observation, _ = get_reference_data("BBB", datetime_start, datetime_end)
+
+        with DatasetAccessor(path_to_NetCDF=nc4_path, keep_open=True) as dataset_accessor:
+            for _ in range(3):
+                data_datetime, data_observation, _ = dataset_accessor.get_data("BBB", datetime_start, datetime_end)
+                assert data_datetime == correct_datetime
+                assert np.allclose(correct_observation, data_observation)
+
+            # a single handle is opened and reused by the calling thread
+            assert len(dataset_accessor.list_open_handles) == 1
+
+            # other threads get their own handle
+            list_results = []
+            list_threads = [threading.Thread(
+                target=lambda: list_results.append(dataset_accessor.get_data("BBB", datetime_start, datetime_end)))
+                for _ in range(2)]
+            for crrt_thread in list_threads:
+                crrt_thread.start()
+            for crrt_thread in list_threads:
+                crrt_thread.join()
+
+            assert len(list_results) == 2
+            assert all(crrt_result[0] == correct_datetime for crrt_result in list_results)
+            assert len(dataset_accessor.list_open_handles) == 3
+
+            list_handles = list(dataset_accessor.list_open_handles)
+
+        assert dataset_accessor.closed
+        assert not any(crrt_handle.isopen() for crrt_handle in list_handles)
+
+        with pytest.raises(Exception):
+            dataset_accessor.get_data("BBB", datetime_start, datetime_end)
+
+
+def test_get_data_irregular_time_base():
+    datetime_start_dump = datetime.datetime(2008, 1, 1, 0, 0, 0, 0, pytz.utc)
+    datetime_end_dump = datetime.datetime(2008, 1, 2, 0, 0, 0, 0, pytz.utc)
+
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        nc4_path = os.path.join(tmpdirname, "synthetic.nc4")
+        write_synthetic_netCDF4_dump(nc4_path, ["AAA"], datetime_start_dump, datetime_end_dump)
+
+        # make the time base irregular: 10 minutes steps, then 20 minutes steps after the first hour
+        with nc4.Dataset(nc4_path, "a") as nc4_fh:
+            np_timestamps = np.array(nc4_fh["timestamps"][:])
+            np_timestamps[6:] = np_timestamps[6] + 2 * (np_timestamps[6:] - np_timestamps[6])
+            nc4_fh["timestamps"][:] = np_timestamps
+
+        dataset_accessor = DatasetAccessor(path_to_NetCDF=nc4_path)
+        assert not dataset_accessor.regular_time_base
+
+        data_datetime, _, _ =\
+            dataset_accessor.get_data("AAA",
+                                      datetime.datetime(2008, 1, 1, 0, 50, 0, 0, pytz.utc),
+                                      datetime.datetime(2008, 1, 1, 1, 30, 0, 0, pytz.utc))
+
+        assert data_datetime == [datetime.datetime(2008, 1, 1, 0, 50, 0, 0, pytz.utc),
+                                 datetime.datetime(2008, 1, 1, 1, 0, 0, 0, pytz.utc),
+                                 datetime.datetime(2008, 1, 1, 1, 20, 0, 0, pytz.utc),
+                                 datetime.datetime(2008, 1, 1, 1, 40, 0, 0, pytz.utc)]
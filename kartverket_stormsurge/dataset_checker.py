@@ -2,8 +2,6 @@ import os
 from pathlib import Path
 import random
 
-import bs4
-from bs4 import BeautifulSoup as bfls
 import logging
 
 import datetime
@@ -14,6 +12,7 @@ from tqdm import tqdm
 
 from kartverket_stormsurge.dataset_accessor import DatasetAccessor
 from kartverket_stormsurge.helper.datetimes import assert_is_utc_datetime
+from kartverket_stormsurge.tideapi_parser import parse_stationdata
 
 
 class DatasetChecker():
@@ -75,36 +74,16 @@ class DatasetChecker():
                 # parse the current file
                 with open(crrt_path, 'rb') as fh:
                     html_string = fh.read()
-                soup = bfls(html_string, features="lxml")
-
-                dict_segment = {}
-
-                # each segment has several datasets
-                for crrt_dataset in soup.findAll("data"):
-                    data_type = crrt_dataset["type"]
-                    data_unit = crrt_dataset["unit"]
-                    data_reflevelcode = crrt_dataset["reflevelcode"]
-
-                    crrt_key = "{}_{}_{}".format(data_type, data_unit, data_reflevelcode)
-
-                    if crrt_key not in dict_segment:
-                        logging.info("create entry {} in the current station data dict".format(crrt_key))
-                        dict_segment[crrt_key] = []
-
-                    # individual entries are specific tags; note that the string content of each tag is empty, the data
-                    # is in the tag specification itself.
-                    for crrt_entry in crrt_dataset:
-                        # effectively ignores the empty string contents, grab data from the tags
-                        if type(crrt_entry) is bs4.element.Tag:
-                            time = crrt_entry["time"]
-                            value = float(crrt_entry["value"])
-                            data_tuple = (dateutil.parser.isoparse(time).astimezone(pytz.utc), value)
-                            dict_segment[crrt_key].append(data_tuple)
+                # each segment has several datasets, parsed as (np_timestamps, np_values)
+                dict_segment = parse_stationdata(html_string)
 
                 if list(dict_segment.keys()) != []:
                     crrt_key = random.choice(list(dict_segment.keys()))
 
-                    crrt_data_tuple = random.choice(dict_segment[crrt_key])
+                    np_timestamps, np_values = dict_segment[crrt_key]
+                    crrt_data_index = random.randrange(len(np_timestamps))
+                    crrt_data_tuple = (datetime.datetime.fromtimestamp(int(np_timestamps[crrt_data_index]), pytz.utc),
+                                       float(np_values[crrt_data_index]))
 
                     crrt_datetime = crrt_data_tuple[0]
 
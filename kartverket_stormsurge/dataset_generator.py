@@ -1,7 +1,10 @@
 """Tools for generating a new netCDF4 storm surge dataset."""
 
+import os
 import logging
-import math
+import time
+import threading
+import collections
 
 import netCDF4 as nc4
 
@@ -13,14 +16,17 @@ import numpy as np
 
 from tqdm import tqdm
 
-import bs4
 from bs4 import BeautifulSoup as bfls
 
-from kartverket_stormsurge.helper.url_request import NicedUrlRequest
+from kartverket_stormsurge.helper.url_request import NicedUrlRequest, NotInCacheError
 from kartverket_stormsurge.helper.raise_assert import ras
-from kartverket_stormsurge.helper.datetimes import assert_is_utc_datetime, datetime_range, datetime_segments, \
-    assert_10min_multiple
+from kartverket_stormsurge.helper.datetimes import assert_is_utc_datetime, datetime_segments, \
+    assert_10min_multiple, timestamps_range
+from kartverket_stormsurge.helper.arrays import values_on_regular_grid
+from kartverket_stormsurge.helper.pipeline import run_fetch_parse_write_pipeline
+from kartverket_stormsurge.helper.journal import ProgressJournal
 from kartverket_stormsurge.helper.last_thursday_of_the_month import get_last_thursday_in_month
+from kartverket_stormsurge.tideapi_parser import parse_stationdata
 
 
 def cache_organizer(request):
@@ -41,6 +47,79 @@ def cache_organizer(request):
         return("")
 
 
+# a segment to fetch while generating the dataset:
+# - station_index: index of the station in the dataset.
+# - station_id: the station ID.
+# - segment_start, segment_end: the time range [segment_start; segment_end[ of the segment.
+# - filling_index: the index of segment_start on the time base of the dataset.
+SegmentJob = collections.namedtuple("SegmentJob", ["station_index", "station_id", "segment_start", "segment_end",
+                                                   "filling_index"])
+
+
+def segment_on_time_base(dict_segment, np_segment_timestamps, grid_step, fill_value, expect_result=True):
+    """Put the parsed data of a segment on the regular time base.
+    Input:
+        - dict_segment: the parsed data, as returned by parse_stationdata.
+        - np_segment_timestamps: int64 array, the timestamps of the segment on the regular time base.
+        - grid_step: the step of the regular time base, in seconds.
+        - fill_value: the value to use where no data is available.
+        - expect_result: whether data was expected, i.e. whether to warn about missing datasets.
+    Output:
+        - the complete segment, as returned by get_individual_station_data_between_datetimes.
+    """
+
+    expected_keys = ["prediction_cm_CD", "observation_cm_CD"]
+
+    obtained_keys = list(dict_segment.keys())
+
+    for crrt_obtained_key in obtained_keys:
+        if crrt_obtained_key not in expected_keys:
+            logging.warning("obtained unexpected key {}".format(crrt_obtained_key))
+            del dict_segment[crrt_obtained_key]
+
+    for crrt_expected_key in expected_keys:
+        if crrt_expected_key not in obtained_keys:
+            if expect_result:
+                logging.warning("missing expected key {}".format(crrt_expected_key))
+            dict_segment[crrt_expected_key] = (np.zeros((0,), dtype=np.int64), np.zeros((0,), dtype=np.float32))
+
+    complete_dict_segment = {"timestamps": np_segment_timestamps}
+
+    for crrt_dataset in expected_keys:
+        np_data_timestamps, np_data_values = dict_segment[crrt_dataset]
+        complete_dict_segment[crrt_dataset] = values_on_regular_grid(np_segment_timestamps[0], grid_step,
+                                                                     len(np_segment_timestamps),
+                                                                     np_data_timestamps, np_data_values,
+                                                                     fill_value)
+
+    return(complete_dict_segment)
+
+
+def parse_segment(raw_segment):
+    """Parse a fetched segment. This is the parse stage of the generation pipeline, that may run
+    in another process.
+    Input:
+        - raw_segment: (html_string, np_segment_timestamps, grid_step, fill_value), see
+            segment_on_time_base; html_string is None if no data was requested for this segment.
+    Output:
+        - (complete_dict_segment, parse_time_s)
+    """
+
+    html_string, np_segment_timestamps, grid_step, fill_value = raw_segment
+
+    time_start = time.perf_counter()
+
+    if html_string is None:
+        dict_segment = {}
+    else:
+        dict_segment = parse_stationdata(html_string)
+
+    complete_dict_segment = segment_on_time_base(dict_segment, np_segment_timestamps, grid_step, fill_value,
+                                                 expect_result=html_string is not None)
+
+    return(complete_dict_segment, time.perf_counter() - time_start)
+
+
 def warn_on_maintenance():
     """Warn if an API request is performed on the last Thursday of the
     month; this is when server maintenance takes place."""
@@ -59,14 +138,26 @@ def warn_on_maintenance():
 
 
 class DatasetGenerator():
-    def __init__(self, cache_folder="default"):
+    def __init__(self, cache_folder="default", metadata_ttl_s=None, offline=False):
         """
         Input:
             - cache_folder: cache property to provide to the
                 NicedUrlRequest. "default" is the user path. Can also
                 provide any valid path, or None to use no caching.
+            - metadata_ttl_s: the station list and station time bounds are
+                memoized in memory, to not request and parse them again for
+                each segment. This is the time in seconds after which a memoized
+                entry is considered stale and obtained again; None (default)
+                means entries are kept for the lifetime of the generator, or
+                until invalidate_metadata_memo is called.
+            - offline: if True, never perform any url request, and only use the
+                answers available in the cache. Metadata missing from the cache
+                raise a NotInCacheError, while data segments missing from the cache
+                are left empty and reported by generate_netCDF4_dataset.
         """
 
+        ras(not (offline and cache_folder is None), "offline mode needs a cache")
+
         self.url_requester = NicedUrlRequest(cache_folder=cache_folder,
                                              cache_organizer=cache_organizer,
                                              request_callback=warn_on_maintenance)
@@ -75,9 +166,60 @@ class DatasetGenerator():
         self.segment_duration = datetime.timedelta(days=5)
         self.fill_value = 1.0e37
 
+        self.offline = offline
+
+        self.metadata_ttl_s = metadata_ttl_s
+        self.dict_metadata_memo = {}
+        self.lock_metadata_memo = threading.Lock()
+
+    def get_memoized_metadata(self, key, function_get_metadata):
+        """Get a metadata entry from the in memory memo if available and fresh
+        enough, else obtain it through function_get_metadata and memoize it.
+        Input:
+            - key: the key of the entry in the memo.
+            - function_get_metadata: function without arguments returning the metadata.
+        Output:
+            - the metadata entry.
+        """
+
+        with self.lock_metadata_memo:
+            if key in self.dict_metadata_memo:
+                time_memoized, metadata = self.dict_metadata_memo[key]
+
+                if self.metadata_ttl_s is None or time.time() - time_memoized < self.metadata_ttl_s:
+                    return(metadata)
+
+        # do not hold the lock during the request; concurrent workers may at worst obtain the same entry twice
+        metadata = function_get_metadata()
+
+        with self.lock_metadata_memo:
+            self.dict_metadata_memo[key] = (time.time(), metadata)
+
+        return(metadata)
+
+    def invalidate_metadata_memo(self, station_id=None):
+        """Drop memoized metadata, so that it is obtained again on next use.
+        Input:
+            - station_id: if None (default), drop all the memoized metadata. Else,
+                only drop the time bounds of this station.
+        """
+
+        with self.lock_metadata_memo:
+            if station_id is None:
+                self.dict_metadata_memo = {}
+            else:
+                self.dict_metadata_memo.pop(("obstime", station_id), None)
+
     def get_stations_information(self):
+        dict_all_stations_data = self.get_memoized_metadata("stationlist", self.request_stations_information)
+
+        # the caller is free to modify the result, do not hand out the memoized dicts
+        return({crrt_station: dict(crrt_station_data) for
+                crrt_station, crrt_station_data in dict_all_stations_data.items()})
+
+    def request_stations_information(self):
         request = "http://api.sehavniva.no/tideapi.php?tide_request=stationlist&type=perm"
-        html_string = self.url_requester.perform_request(request)
+        html_string = self.url_requester.perform_request(request, cache_only=self.offline)
         soup = bfls(html_string, features="lxml")
         list_tags = soup.find('stationinfo').select('location')
 
@@ -101,8 +243,14 @@ class DatasetGenerator():
         return(dict_all_stations_data)
 
     def get_individual_station_time_bounds(self, station_id):
+        dict_timebounds = self.get_memoized_metadata(("obstime", station_id),
+                                                     lambda: self.request_individual_station_time_bounds(station_id))
+
+        return(dict(dict_timebounds))
+
+    def request_individual_station_time_bounds(self, station_id):
         request = "http://api.sehavniva.no/tideapi.php?tide_request=obstime&stationcode={}".format(station_id)
-        html_string = self.url_requester.perform_request(request)
+        html_string = self.url_requester.perform_request(request, cache_only=self.offline)
         soup = bfls(html_string, features="lxml")
 
         dict_timebounds = {}
@@ -115,98 +263,115 @@ class DatasetGenerator():
         return(dict_timebounds)
 
     def get_individual_station_data_between_datetimes(self, station_id, start, end):
+        """Get the data of a station over the segment [start; end[.
+        Input:
+            - station_id: the station ID, for example 'OSL'.
+            - start, end: the limits of the segment, should be multiples of 10 minutes.
+        Output:
+            - a dict with the keys:
+                - "timestamps": the int64 POSIX timestamps of the segment, on the regular time base.
+                - "observation_cm_CD", "prediction_cm_CD": the float32 data on these timestamps,
+                    fill_value where no data is available.
+        """
+
+        html_string = self.fetch_individual_station_data_between_datetimes(station_id, start, end)
+
+        np_segment_timestamps = timestamps_range(start, end, self.resolution_timedelta)
+
+        complete_dict_segment, _ = parse_segment((html_string, np_segment_timestamps,
+                                                  int(self.resolution_timedelta.total_seconds()), self.fill_value))
+
+        return(complete_dict_segment)
+
+    def fetch_individual_station_data_between_datetimes(self, station_id, start, end):
+        """Get the raw answer to the data request of a station over the segment [start; end[.
+        Input:
+            - station_id: the station ID, for example 'OSL'.
+            - start, end: the limits of the segment, should be multiples of 10 minutes.
+        Output:
+            - the raw answer, or None if the segment is outside of the time bounds of the
+                station, in which case no request is performed.
+        Can raise:
+            a NotInCacheError in offline mode, if the answer is not in the cache.
+        """
         assert_is_utc_datetime(start)
         assert_is_utc_datetime(end)
 
         assert_10min_multiple(start)
         assert_10min_multiple(end)
 
-        expected_datetimes = datetime_range(start, end, self.resolution_timedelta)
-
-        expected_keys = ["prediction_cm_CD", "observation_cm_CD"]
-
-        dict_segment = {}
-
         dict_bounds_station = self.get_individual_station_time_bounds(station_id)
         station_start = dict_bounds_station["first"]
         station_end = dict_bounds_station["last"]
 
-        expect_result = False
-
-        if self.check_time_segment_within_bounds(start, end, station_start, station_end):
-            expect_result = True
-            strftime_format = "%Y-%m-%dT%H:%M:%S"
-            utc_time_start = start.strftime(strftime_format)
-            utc_time_end = end.strftime(strftime_format)
-            time_resolution_minutes = 10
-
-            request = "https://api.sehavniva.no/tideapi.php"\
-                "?stationcode={}"\
-                "&fromtime={}"\
-                "&totime={}"\
-                "&datatype=obs"\
-                "&refcode=cd"\
-                "&place="\
-                "&file="\
-                "&lang=en"\
-                "&interval={}"\
-                "&dst="\
-                "&tzone=utc"\
-                "&tide_request=stationdata".format(station_id, utc_time_start, utc_time_end, time_resolution_minutes)
-
-            html_string = self.url_requester.perform_request(request)
-
-            soup = bfls(html_string, features="lxml")
-
-            for crrt_dataset in soup.findAll("data"):
-                data_type = crrt_dataset["type"]
-                data_unit = crrt_dataset["unit"]
-                data_reflevelcode = crrt_dataset["reflevelcode"]
-
-                crrt_key = "{}_{}_{}".format(data_type, data_unit, data_reflevelcode)
-
-                dict_segment[crrt_key] = {}
-
-                # individual entries are specific tags; note that the string content of each tag is empty, the data
-                # is in the tag specification itself.
-                for crrt_entry in crrt_dataset:
-                    # effectively ignores the empty string contents, grab data from the tags
-                    if type(crrt_entry) is bs4.element.Tag:
-                        time = crrt_entry["time"]
-                        crrt_value = float(crrt_entry["value"])
-                        crrt_datetime = dateutil.parser.isoparse(time).astimezone(pytz.utc)
-                        dict_segment[crrt_key][crrt_datetime] = crrt_value
-
-        obtained_keys = list(dict_segment.keys())
-
-        for crrt_obtained_key in obtained_keys:
-            if crrt_obtained_key not in expected_keys:
-                logging.warning("obtained unexpected key {}".format(crrt_obtained_key))
-                del dict_segment[crrt_obtained_key]
-
-        for crrt_expected_key in expected_keys:
-            if crrt_expected_key not in obtained_keys:
-                if expect_result:
-                    logging.warning("missing expected key {}".format(crrt_expected_key))
-                dict_segment[crrt_expected_key] = {}
-
-        complete_dict_segment = {}
-
-        for crrt_time in expected_datetimes:
-            complete_dict_segment[crrt_time] = {}
-            for crrt_dataset in expected_keys:
-                if crrt_time in dict_segment[crrt_dataset]:
-                    complete_dict_segment[crrt_time][crrt_dataset] = dict_segment[crrt_dataset][crrt_time]
-                else:
-                    complete_dict_segment[crrt_time][crrt_dataset] = self.fill_value
-
-        return(complete_dict_segment)
+        if not self.check_time_segment_within_bounds(start, end, station_start, station_end):
+            return(None)
+
+        strftime_format = "%Y-%m-%dT%H:%M:%S"
+        utc_time_start = start.strftime(strftime_format)
+        utc_time_end = end.strftime(strftime_format)
+        time_resolution_minutes = 10
+
+        request = "https://api.sehavniva.no/tideapi.php"\
+            "?stationcode={}"\
+            "&fromtime={}"\
+            "&totime={}"\
+            "&datatype=obs"\
+            "&refcode=cd"\
+            "&place="\
+            "&file="\
+            "&lang=en"\
+            "&interval={}"\
+            "&dst="\
+            "&tzone=utc"\
+            "&tide_request=stationdata".format(station_id, utc_time_start, utc_time_end, time_resolution_minutes)
+
+        return(self.url_requester.perform_request(request, cache_only=self.offline))
 
     def generate_netCDF4_dataset(self, datetime_start, datetime_end, list_station_ids=None,
-                                 nc4_path="./data_kartverket_storm_surge.nc4"):
+                                 nc4_path="./data_kartverket_storm_surge.nc4", nbr_workers=1, nbr_parse_processes=None,
+                                 queue_size=64, resume=False, checkpoint_every_n_segments=500):
+        """Generate the netCDF4 dataset.
+        Input:
+            - datetime_start, datetime_end: the time range [datetime_start; datetime_end[ of the dataset.
+            - list_station_ids: the stations to include; None (default) means all available stations.
+            - nc4_path: where to write the dataset.
+            - nbr_workers: the number of threads fetching segments concurrently. All workers share the
+                rate limit of the url requester, so that several workers do not increase the request rate
+                to the server, but let cache reads and parsing overlap with waiting for the next request.
+            - nbr_parse_processes: the number of processes parsing the fetched segments; 0 means
+                parsing in the writer thread. None (default) means 0, or all the cores in offline mode,
+                where reading the cache is fast and parsing is the bottleneck.
+            - queue_size: the maximum number of fetched segments waiting to be parsed.
+            - resume: if True, and a previous generation of nc4_path with the same parameters was
+                interrupted, resume it: the segments that were already written are skipped. If False
+                (default), always generate from scratch.
+            - checkpoint_every_n_segments: progress is checkpointed (data flushed to disk, and the
+                written segments recorded in the journal nc4_path + ".journal") each time a station
+                is completed, and at least every checkpoint_every_n_segments segments.
+        The generation runs as a pipeline: fetch threads push the raw answers into a bounded queue, they
+        get parsed, and a single writer streams each parsed segment into the netCDF4 variables as it
+        arrives. This way, memory use is bounded by the queue size rather than by the number of stations
+        or the time range.
+        Output:
+            - a dict of statistics about the generation: "duration_s", "number_of_requests" (the
+                number of url requests actually performed, i.e. not served from cache),
+                "requests_per_s", "number_of_segments" (written in this run), "number_of_segments_skipped"
+                (already written by a previous run), "segments_per_s", and the cumulated
+                "parse_time_s" and "write_time_s".
+            - in offline mode, the statistics also contain "missing_segments": the list of SegmentJob
+                that were not available in the cache. These segments are left empty, and not recorded
+                in the journal, so that the generation can then be resumed online to fetch only them.
+        """
         assert_is_utc_datetime(datetime_start)
         assert_is_utc_datetime(datetime_end)
 
+        if nbr_parse_processes is None:
+            nbr_parse_processes = os.cpu_count() if self.offline else 0
+
+        time_start_generation = time.time()
+        number_of_requests_start = self.url_requester.number_of_requests_performed
+
         dict_station_data = self.get_stations_information()
         list_available_station_ids = sorted(list(dict_station_data.keys()))
 
@@ -218,115 +383,281 @@ class DatasetGenerator():
 
         ras(isinstance(list_station_ids, list))
 
-        timestamps_vector = [crrt_datetime.timestamp() for
-                             crrt_datetime in datetime_range(datetime_start,
-                                                             datetime_end,
-                                                             self.resolution_timedelta)]
+        timestamps_vector = timestamps_range(datetime_start, datetime_end, self.resolution_timedelta)
 
-        number_of_time_entries = len(timestamps_vector)
+        journal = ProgressJournal(nc4_path + ".journal")
+        dict_journal_header = {"datetime_start": datetime_start.isoformat(),
+                               "datetime_end": datetime_end.isoformat(),
+                               "list_station_ids": list_station_ids,
+                               "resolution_s": self.resolution_timedelta.total_seconds(),
+                               "segment_duration_s": self.segment_duration.total_seconds()}
+
+        nc4_fh = None
+        set_completed = set()
 
-        with nc4.Dataset(nc4_path, "w", format="NETCDF4") as nc4_fh:
+        if resume:
+            nc4_fh, set_completed = self.open_for_resume(nc4_path, journal, dict_journal_header, timestamps_vector)
+
+        if nc4_fh is None:
+            nc4_fh = nc4.Dataset(nc4_path, "w", format="NETCDF4")
+
+            try:
+                self.create_netCDF4_layout(nc4_fh, list_station_ids, dict_station_data, timestamps_vector)
+                nc4_fh.sync()
+            except Exception:
+                nc4_fh.close()
+                raise
+
+            # the journal is only started once the layout is safely on disk
+            journal.start(dict_journal_header)
+
+        with nc4_fh:
             nc4_fh.set_auto_mask(False)
 
-            description_string = "Storm surge dataset from the Norwegian coast, " +\
-                                 "built from the data obtained from kartverket web API, " +\
-                                 "using the code at: " +\
-                                 "MachineOcean-WP12/storm_surge/learn_error/prepare_data/prepare_data.py " +\
-                                 "generated on {} ".format(datetime.datetime.now().isoformat()[:10]) +\
-                                 "in all the following, except stated otherwise, CD (chart datum) ref level " +\
-                                 "is used, units are cm, and all timestamps are UTC. "
-
-            nc4_fh.Conventions = "CF-X.X"
-            nc4_fh.title = "storm surge from kartverket API"
-            nc4_fh.description = description_string
-            nc4_fh.institution = "IT department, Norwegian Meteorological Institute, using data from Kartverket"
-            nc4_fh.Contact = "jeanr@met.no"
-
-            _ = nc4_fh.createDimension('station', len(list_station_ids))
-            _ = nc4_fh.createDimension('time', number_of_time_entries)
-
-            stationid = nc4_fh.createVariable("stationid", str, ('station'))
-            latitude = nc4_fh.createVariable('latitude', 'f4', ('station'))
-            longitude = nc4_fh.createVariable('longitude', 'f4', ('station'))
-            timestamps = nc4_fh.createVariable('timestamps', 'i8', ('time'))
-            observation = nc4_fh.createVariable('observation', 'f4', ('station', 'time'))
-            prediction = nc4_fh.createVariable('prediction', 'f4', ('station', 'time'))
-            timestamp_start = nc4_fh.createVariable('timestamp_start', 'i8', ('station'))
-            timestamp_end = nc4_fh.createVariable('timestamp_end', 'i8', ('station'))
-
-            stationid.description = "unique ID string of each station"
-            stationid.units = "none, 3 capital letters"
-
-            latitude.description = "latitude of each station"
-            latitude.units = "degree North"
-
-            longitude.description = "longitude of each station"
-            longitude.units = "degree East"
-
-            timestamps.description = "common time base for all data"
-            timestamps.units = "POSIX timestamp"
-
-            observation.description = "water level observation at each station over the time base, "\
-                "CD (Chart Datum) reference level"
-            observation.units = "cm, fill value: 1.0e37"
-            observation.standard_name = "observed_sea_surface_height_at_chartdatum"
-
-            prediction.description = "water level prediction by Kartverket, " +\
-                "using only astronomic tide effects, at each station over the time base, "\
-                "CD (Chart Datum) reference level"
-            prediction.units = "cm, fill value: 1.0e37"
-            prediction.standard_name = "sea_surface_height_amplitude_due_to_earth_tide"
-
-            timestamp_start.description = "first timestamp for which data are available, " +\
-                "for each station; there may be holes though"
-            timestamp_start.units = "POSIX timestamp"
-
-            timestamp_end.description = "last timestamp for which data are available, " +\
-                "for each station; there may be holes though"
-            timestamp_end.units = "POSIX timestamp"
-
-            timestamps[:] = np.array(timestamps_vector)
-
-            for ind, crrt_station_id in tqdm(enumerate(list_station_ids),
-                                             desc="station", total=len(list_station_ids)):
-                stationid[ind] = crrt_station_id
-                latitude[ind] = dict_station_data[crrt_station_id]["latitude"]
-                longitude[ind] = dict_station_data[crrt_station_id]["longitude"]
-
-                dict_crrt_timebounds = self.get_individual_station_time_bounds(crrt_station_id)
-                timestamp_start[ind] = dict_crrt_timebounds["first"].timestamp()
-                timestamp_end[ind] = dict_crrt_timebounds["last"].timestamp()
-
-                np_observations = -self.fill_value * np.ones((number_of_time_entries,))
-                np_predictions = -self.fill_value * np.ones((number_of_time_entries,))
-
-                crrt_filling_index = 0
-                approx_nbr_segments = math.ceil((datetime_end - datetime_start) / self.segment_duration)
-
-                for crrt_segment in tqdm(datetime_segments(datetime_start,
-                                                           datetime_end,
-                                                           self.segment_duration
-                                                           ),
-                                         desc="segment", total=approx_nbr_segments
-                                         ):
-
-                    dict_crrt_segment =\
-                        self.get_individual_station_data_between_datetimes(crrt_station_id,
-                                                                           crrt_segment[0],
-                                                                           crrt_segment[1])
-
-                    for crrt_time in list(dict_crrt_segment.keys()):
-                        ras(timestamps[crrt_filling_index] == crrt_time.timestamp())
-                        np_observations[crrt_filling_index] = dict_crrt_segment[crrt_time]["observation_cm_CD"]
-                        np_predictions[crrt_filling_index] = dict_crrt_segment[crrt_time]["prediction_cm_CD"]
-                        crrt_filling_index += 1
-
-                observation[ind, :] = np_observations
-                prediction[ind, :] = np_predictions
-
-        # populate metadata
-        # note: initialize the whole dataset as "invalid"
-        pass
+            observation = nc4_fh["observation"]
+            prediction = nc4_fh["prediction"]
+
+            list_segment_jobs = [crrt_job for crrt_job in
+                                 self.list_segment_jobs(list_station_ids, datetime_start, datetime_end)
+                                 if (crrt_job.station_index, crrt_job.filling_index) not in set_completed]
+
+            if len(set_completed) > 0:
+                logging.info("resume generation: skip {} segments already written, {} segments left"
+                             .format(len(set_completed), len(list_segment_jobs)))
+
+            dict_pipeline_statistics = {"parse_time_s": 0.0, "write_time_s": 0.0}
+
+            # segments not available in the cache, in offline mode
+            set_missing_segments = set()
+            lock_missing_segments = threading.Lock()
+
+            # segments written since the last checkpoint, and segments left to write for each station
+            list_not_checkpointed = []
+            dict_segments_left = collections.Counter(crrt_job.station_index for crrt_job in list_segment_jobs)
+
+            def checkpoint():
+                # make sure the data is on disk before recording it as completed
+                nc4_fh.sync()
+                journal.record(list_not_checkpointed)
+                list_not_checkpointed.clear()
+
+            def fetch_segment(segment_job):
+                try:
+                    html_string = self.fetch_individual_station_data_between_datetimes(segment_job.station_id,
+                                                                                       segment_job.segment_start,
+                                                                                       segment_job.segment_end)
+                except NotInCacheError:
+                    if not self.offline:
+                        raise
+
+                    with lock_missing_segments:
+                        set_missing_segments.add(segment_job)
+                    html_string = None
+
+                np_segment_timestamps = timestamps_range(segment_job.segment_start, segment_job.segment_end,
+                                                         self.resolution_timedelta)
+                return (html_string, np_segment_timestamps, int(self.resolution_timedelta.total_seconds()),
+                        self.fill_value)
+
+            def write_segment(segment_job, parsed_segment):
+                dict_crrt_segment, parse_time_s = parsed_segment
+                time_start_write = time.perf_counter()
+
+                first_index = segment_job.filling_index
+                last_index = first_index + len(dict_crrt_segment["timestamps"])
+
+                ras(np.array_equal(timestamps_vector[first_index:last_index], dict_crrt_segment["timestamps"]))
+                observation[segment_job.station_index, first_index:last_index] =\
+                    dict_crrt_segment["observation_cm_CD"]
+                prediction[segment_job.station_index, first_index:last_index] =\
+                    dict_crrt_segment["prediction_cm_CD"]
+
+                # missing segments are left empty, but not recorded, so that a resumed generation fetches them
+                if segment_job not in set_missing_segments:
+                    list_not_checkpointed.append((segment_job.station_index, segment_job.filling_index))
+                dict_segments_left[segment_job.station_index] -= 1
+
+                if dict_segments_left[segment_job.station_index] == 0 or\
+                        len(list_not_checkpointed) >= checkpoint_every_n_segments:
+                    checkpoint()
+
+                dict_pipeline_statistics["parse_time_s"] += parse_time_s
+                dict_pipeline_statistics["write_time_s"] += time.perf_counter() - time_start_write
+
+            with tqdm(desc="segment", total=len(list_segment_jobs)) as progress_bar:
+                run_fetch_parse_write_pipeline(list_segment_jobs, fetch_segment, parse_segment, write_segment,
+                                               nbr_fetch_workers=nbr_workers,
+                                               nbr_parse_processes=nbr_parse_processes,
+                                               queue_size=queue_size,
+                                               function_progress=progress_bar.update)
+
+            checkpoint()
+
+        list_missing_segments = sorted(set_missing_segments)
+
+        if len(list_missing_segments) == 0:
+            # the dataset is complete, nothing left to resume
+            journal.remove()
+        else:
+            logging.warning("{} segments are missing from the cache, resume the generation online to fetch them"
+                            .format(len(list_missing_segments)))
+
+        duration_s = time.time() - time_start_generation
+        number_of_requests = self.url_requester.number_of_requests_performed - number_of_requests_start
+
+        dict_statistics = {"duration_s": duration_s,
+                           "number_of_requests": number_of_requests,
+                           "requests_per_s": number_of_requests / duration_s,
+                           "number_of_segments": len(list_segment_jobs),
+                           "number_of_segments_skipped": len(set_completed),
+                           "segments_per_s": len(list_segment_jobs) / duration_s,
+                           "parse_time_s": dict_pipeline_statistics["parse_time_s"],
+                           "write_time_s": dict_pipeline_statistics["write_time_s"]}
+
+        if self.offline:
+            dict_statistics["missing_segments"] = list_missing_segments
+
+        logging.info("performed {} url requests in {:.1f} s, i.e. {:.3f} requests per second"
+                     .format(number_of_requests, duration_s, dict_statistics["requests_per_s"]))
+
+        return(dict_statistics)
+
+    def open_for_resume(self, nc4_path, journal, dict_journal_header, timestamps_vector):
+        """Open a partially generated dataset to resume its generation.
+        Input:
+            - nc4_path: the path to the dataset.
+            - journal: the ProgressJournal of the generation.
+            - dict_journal_header: the header describing the generation to resume.
+            - timestamps_vector: the time base of the generation to resume.
+        Output:
+            - (nc4_fh, set_completed): the dataset opened in append mode, and the set of
+                (station_index, filling_index) of the segments already written. nc4_fh is None
+                if there is nothing to resume, or the dataset cannot be reopened.
+        Can raise:
+            a ValueError if the generation to resume has different parameters.
+        """
+
+        if not (journal.exists() and os.path.isfile(nc4_path)):
+            logging.info("nothing to resume for {}, start from scratch".format(nc4_path))
+            return(None, set())
+
+        dict_previous_header, set_completed = journal.load()
+
+        if dict_previous_header != dict_journal_header:
+            raise ValueError("cannot resume the generation of {}: it was started with {}, but asked for {}"
+                             .format(nc4_path, dict_previous_header, dict_journal_header))
+
+        try:
+            nc4_fh = nc4.Dataset(nc4_path, "a")
+        except OSError as crrt_exception:
+            # for example, if the file got corrupted by a crash in the middle of a write
+            logging.warning("cannot reopen {} ({}), start from scratch".format(nc4_path, crrt_exception))
+            return(None, set())
+
+        ras(len(nc4_fh.dimensions["station"]) == len(dict_journal_header["list_station_ids"]))
+        ras(np.array_equal(nc4_fh["timestamps"][:], timestamps_vector))
+
+        return(nc4_fh, set_completed)
+
+    def create_netCDF4_layout(self, nc4_fh, list_station_ids, dict_station_data, timestamps_vector):
+        """Create the dimensions, variables and attributes of the dataset, and fill all the
+        variables except the observations and predictions.
+        Input:
+            - nc4_fh: the dataset, open for writing.
+            - list_station_ids: the stations of the dataset.
+            - dict_station_data: the station information, as given by get_stations_information.
+            - timestamps_vector: the time base of the dataset.
+        """
+
+        number_of_time_entries = len(timestamps_vector)
+
+        nc4_fh.set_auto_mask(False)
+
+        description_string = "Storm surge dataset from the Norwegian coast, " +\
+                             "built from the data obtained from kartverket web API, " +\
+                             "using the code at: " +\
+                             "MachineOcean-WP12/storm_surge/learn_error/prepare_data/prepare_data.py " +\
+                             "generated on {} ".format(datetime.datetime.now().isoformat()[:10]) +\
+                             "in all the following, except stated otherwise, CD (chart datum) ref level " +\
+                             "is used, units are cm, and all timestamps are UTC. "
+
+        nc4_fh.Conventions = "CF-X.X"
+        nc4_fh.title = "storm surge from kartverket API"
+        nc4_fh.description = description_string
+        nc4_fh.institution = "IT department, Norwegian Meteorological Institute, using data from Kartverket"
+        nc4_fh.Contact = "jeanr@met.no"
+
+        _ = nc4_fh.createDimension('station', len(list_station_ids))
+        _ = nc4_fh.createDimension('time', number_of_time_entries)
+
+        stationid = nc4_fh.createVariable("stationid", str, ('station'))
+        latitude = nc4_fh.createVariable('latitude', 'f4', ('station'))
+        longitude = nc4_fh.createVariable('longitude', 'f4', ('station'))
+        timestamps = nc4_fh.createVariable('timestamps', 'i8', ('time'))
+        observation = nc4_fh.createVariable('observation', 'f4', ('station', 'time'))
+        prediction = nc4_fh.createVariable('prediction', 'f4', ('station', 'time'))
+        timestamp_start = nc4_fh.createVariable('timestamp_start', 'i8', ('station'))
+        timestamp_end = nc4_fh.createVariable('timestamp_end', 'i8', ('station'))
+
+        stationid.description = "unique ID string of each station"
+        stationid.units = "none, 3 capital letters"
+
+        latitude.description = "latitude of each station"
+        latitude.units = "degree North"
+
+        longitude.description = "longitude of each station"
+        longitude.units = "degree East"
+
+        timestamps.description = "common time base for all data"
+        timestamps.units = "POSIX timestamp"
+
+        observation.description = "water level observation at each station over the time base, "\
+            "CD (Chart Datum) reference level"
+        observation.units = "cm, fill value: 1.0e37"
+        observation.standard_name = "observed_sea_surface_height_at_chartdatum"
+
+        prediction.description = "water level prediction by Kartverket, " +\
+            "using only astronomic tide effects, at each station over the time base, "\
+            "CD (Chart Datum) reference level"
+        prediction.units = "cm, fill value: 1.0e37"
+        prediction.standard_name = "sea_surface_height_amplitude_due_to_earth_tide"
+
+        timestamp_start.description = "first timestamp for which data are available, " +\
+            "for each station; there may be holes though"
+        timestamp_start.units = "POSIX timestamp"
+
+        timestamp_end.description = "last timestamp for which data are available, " +\
+            "for each station; there may be holes though"
+        timestamp_end.units = "POSIX timestamp"
+
+        timestamps[:] = timestamps_vector
+
+        for ind, crrt_station_id in enumerate(list_station_ids):
+            stationid[ind] = crrt_station_id
+            latitude[ind] = dict_station_data[crrt_station_id]["latitude"]
+            longitude[ind] = dict_station_data[crrt_station_id]["longitude"]
+
+            dict_crrt_timebounds = self.get_individual_station_time_bounds(crrt_station_id)
+            timestamp_start[ind] = dict_crrt_timebounds["first"].timestamp()
+            timestamp_end[ind] = dict_crrt_timebounds["last"].timestamp()
+
+    def list_segment_jobs(self, list_station_ids, datetime_start, datetime_end):
+        """List the segments to fetch to cover [datetime_start; datetime_end[ for each station.
+        Output:
+            - a list of SegmentJob, station after station.
+        """
+
+        list_segments = list(datetime_segments(datetime_start, datetime_end, self.segment_duration))
+
+        list_segment_jobs = []
+
+        for ind, crrt_station_id in enumerate(list_station_ids):
+            for crrt_segment_start, crrt_segment_end in list_segments:
+                filling_index = (crrt_segment_start - datetime_start) // self.resolution_timedelta
+                list_segment_jobs.append(SegmentJob(ind, crrt_station_id, crrt_segment_start, crrt_segment_end,
+                                                    filling_index))
+
+        return(list_segment_jobs)
 
     def check_time_segment_within_bounds(self, segment_start, segment_end, bound_start, bound_end):
         assert_is_utc_datetime(segment_start)
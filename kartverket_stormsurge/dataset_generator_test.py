@@ -0,0 +1,262 @@
+"""Offline tests of the DatasetGenerator, with the API answers served from canned strings."""
+
+import os
+import tempfile
+import datetime
+import urllib.parse
+import numpy as np
+import pytz
+
+import pytest
+
+from kartverket_stormsurge.dataset_generator import DatasetGenerator, cache_organizer
+from kartverket_stormsurge.dataset_accessor import DatasetAccessor
+from kartverket_stormsurge.helper.url_request import NicedUrlRequest, NotInCacheError
+from kartverket_stormsurge.helper.synthetic_dataset import synthetic_stationdata_xml, synthetic_water_levels
+
+stationlist_string = b"""<tide>
+<stationinfo>
+<location name="Oslo" code="OSL" latitude="59.908559" longitude="10.734510" type="PERM"/>
+<location name="Bergen" code="BGO" latitude="60.398046" longitude="5.320487" type="PERM"/>
+</stationinfo>
+</tide>
+"""
+
+obstime_string = b"""<tide>
+<obstime first="1914-01-01T00:00:00+00:00" last="2020-06-01T00:00:00+00:00"/>
+</tide>
+"""
+
+
+class CountingRequester():
+    """Answers the metadata requests with canned strings, and the data requests with
+    synthetic data, and counts the requests."""
+
+    def __init__(self):
+        self.list_requests = []
+
+    @property
+    def number_of_requests_performed(self):
+        return len(self.list_requests)
+
+    def perform_request(self, request, cache_only=False):
+        self.list_requests.append(request)
+
+        if "stationlist" in request:
+            return stationlist_string
+        elif "obstime" in request:
+            return obstime_string
+        elif "stationdata" in request:
+            dict_query = urllib.parse.parse_qs(urllib.parse.urlparse(request).query)
+            datetime_start, datetime_end = [datetime.datetime.fromisoformat(dict_query[crrt_key][0])
+                                            .replace(tzinfo=pytz.utc) for crrt_key in ["fromtime", "totime"]]
+            return synthetic_stationdata_xml(dict_query["stationcode"][0], datetime_start, datetime_end)
+        else:
+            raise ValueError("unexpected request {}".format(request))
+
+
+def test_metadata_memo():
+    dataset_generator = DatasetGenerator(cache_folder=None)
+    dataset_generator.url_requester = CountingRequester()
+
+    dict_stations_information = dataset_generator.get_stations_information()
+    assert sorted(dict_stations_information.keys()) == ["BGO", "OSL"]
+    assert dict_stations_information["OSL"]["first_datetime"] == datetime.datetime(1914, 1, 1, tzinfo=pytz.utc)
+    assert len(dataset_generator.url_requester.list_requests) == 3
+
+    # the memoized data is not altered by the caller
+    dict_stations_information["OSL"]["latitude"] = "0.0"
+
+    dict_stations_information = dataset_generator.get_stations_information()
+    assert dict_stations_information["OSL"]["latitude"] == "59.908559"
+
+    dict_timebounds = dataset_generator.get_individual_station_time_bounds("OSL")
+    assert dict_timebounds["last"] == datetime.datetime(2020, 6, 1, tzinfo=pytz.utc)
+    assert len(dataset_generator.url_requester.list_requests) == 3
+
+    dataset_generator.invalidate_metadata_memo("OSL")
+    dataset_generator.get_individual_station_time_bounds("OSL")
+    dataset_generator.get_individual_station_time_bounds("BGO")
+    assert len(dataset_generator.url_requester.list_requests) == 4
+
+    dataset_generator.invalidate_metadata_memo()
+    dataset_generator.get_stations_information()
+    assert len(dataset_generator.url_requester.list_requests) == 7
+
+
+def test_metadata_memo_ttl():
+    dataset_generator = DatasetGenerator(cache_folder=None, metadata_ttl_s=0.0)
+    dataset_generator.url_requester = CountingRequester()
+
+    dataset_generator.get_individual_station_time_bounds("OSL")
+    dataset_generator.get_individual_station_time_bounds("OSL")
+    assert len(dataset_generator.url_requester.list_requests) == 2
+
+
+def test_generate_netCDF4_dataset_pipeline():
+    datetime_start = datetime.datetime(2008, 1, 1, 0, 0, tzinfo=pytz.utc)
+    datetime_end = datetime.datetime(2008, 2, 1, 0, 0, tzinfo=pytz.utc)
+
+    datetime_start_test = datetime.datetime(2008, 1, 3, 9, 0, tzinfo=pytz.utc)
+    datetime_end_test = datetime.datetime(2008, 1, 29, 9, 0, tzinfo=pytz.utc)
+
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        for nbr_workers, nbr_parse_processes in [(1, 0), (3, 0), (2, 2)]:
+            nc4_path = os.path.join(tmpdirname, "dataset_{}_{}.nc4".format(nbr_workers, nbr_parse_processes))
+
+            dataset_generator = DatasetGenerator(cache_folder=None)
+            dataset_generator.url_requester = CountingRequester()
+            dict_statistics = dataset_generator.generate_netCDF4_dataset(datetime_start, datetime_end,
+                                                                         nc4_path=nc4_path, nbr_workers=nbr_workers,
+                                                                         nbr_parse_processes=nbr_parse_processes,
+                                                                         queue_size=4)
+
+            # the station list, the (memoized) time bounds of each station, and 7 segments of 5 days per station
+            assert dict_statistics["number_of_requests"] == 1 + 2 + 2 * 7
+            assert dict_statistics["number_of_segments"] == 2 * 7
+
+            dataset_accessor = DatasetAccessor(path_to_NetCDF=nc4_path)
+            assert list(dataset_accessor.station_ids) == ["BGO", "OSL"]
+
+            for crrt_station in ["BGO", "OSL"]:
+                data_datetime, data_observation, data_prediction =\
+                    dataset_accessor.get_data(crrt_station, datetime_start_test, datetime_end_test)
+
+                np_timestamps = np.array([crrt_datetime.timestamp() for crrt_datetime in data_datetime])
+                correct_observation, correct_prediction = synthetic_water_levels(crrt_station, np_timestamps)
+
+                assert data_datetime[0] == datetime_start_test
+                assert data_datetime[-1] == datetime_end_test
+                assert np.allclose(correct_observation, data_observation)
+                assert np.allclose(correct_prediction, data_prediction)
+
+
+class FailingRequester(CountingRequester):
+    """Fails on the data requests of OSL starting 2008-01-11."""
+
+    def perform_request(self, request, cache_only=False):
+        if "2008-01-11" in request and "OSL" in request:
+            raise ValueError("url request retries exhausted")
+        return super().perform_request(request, cache_only=cache_only)
+
+
+def test_generate_netCDF4_dataset_error():
+    """an error in a stage stops the generation and is raised to the caller"""
+
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        dataset_generator = DatasetGenerator(cache_folder=None)
+        dataset_generator.url_requester = FailingRequester()
+
+        with pytest.raises(ValueError):
+            dataset_generator.generate_netCDF4_dataset(datetime.datetime(2008, 1, 1, 0, 0, tzinfo=pytz.utc),
+                                                       datetime.datetime(2008, 2, 1, 0, 0, tzinfo=pytz.utc),
+                                                       nc4_path=os.path.join(tmpdirname, "dataset.nc4"),
+                                                       nbr_workers=2)
+
+
+def test_generate_netCDF4_dataset_resume():
+    datetime_start = datetime.datetime(2008, 1, 1, 0, 0, tzinfo=pytz.utc)
+    datetime_end = datetime.datetime(2008, 2, 1, 0, 0, tzinfo=pytz.utc)
+
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        nc4_path = os.path.join(tmpdirname, "dataset.nc4")
+
+        dataset_generator = DatasetGenerator(cache_folder=None)
+        dataset_generator.url_requester = FailingRequester()
+
+        with pytest.raises(ValueError):
+            dataset_generator.generate_netCDF4_dataset(datetime_start, datetime_end, nc4_path=nc4_path,
+                                                       checkpoint_every_n_segments=1)
+
+        assert os.path.isfile(nc4_path + ".journal")
+
+        # resuming with other parameters is refused
+        dataset_generator.url_requester = CountingRequester()
+        with pytest.raises(ValueError):
+            dataset_generator.generate_netCDF4_dataset(datetime_start, datetime_end, nc4_path=nc4_path,
+                                                       list_station_ids=["OSL"], resume=True)
+
+        # resuming only fetches the segments that were not written
+        dataset_generator.url_requester = CountingRequester()
+        dict_statistics = dataset_generator.generate_netCDF4_dataset(datetime_start, datetime_end,
+                                                                     nc4_path=nc4_path, resume=True)
+
+        assert dict_statistics["number_of_segments_skipped"] >= 7
+        assert dict_statistics["number_of_segments_skipped"] + dict_statistics["number_of_segments"] == 2 * 7
+        assert dict_statistics["number_of_requests"] == dict_statistics["number_of_segments"]
+        assert not os.path.isfile(nc4_path + ".journal")
+
+        dataset_accessor = DatasetAccessor(path_to_NetCDF=nc4_path)
+
+        for crrt_station in ["BGO", "OSL"]:
+            data_datetime, data_observation, _ =\
+                dataset_accessor.get_data(crrt_station,
+                                          datetime.datetime(2008, 1, 2, 0, 0, tzinfo=pytz.utc),
+                                          datetime.datetime(2008, 1, 31, 0, 0, tzinfo=pytz.utc))
+
+            np_timestamps = np.array([crrt_datetime.timestamp() for crrt_datetime in data_datetime])
+            correct_observation, _ = synthetic_water_levels(crrt_station, np_timestamps)
+
+            assert np.allclose(correct_observation, data_observation)
+
+
+def test_generate_netCDF4_dataset_offline():
+    datetime_start = datetime.datetime(2008, 1, 1, 0, 0, tzinfo=pytz.utc)
+    datetime_end = datetime.datetime(2008, 2, 1, 0, 0, tzinfo=pytz.utc)
+
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        cache_folder = os.path.join(tmpdirname, "cache")
+
+        # nothing in cache: the metadata cannot be obtained
+        with pytest.raises(NotInCacheError):
+            DatasetGenerator(cache_folder=cache_folder, offline=True).get_stations_information()
+
+        # fill the cache with the answers to all the requests of a generation, except one OSL segment
+        counting_requester = CountingRequester()
+        dataset_generator = DatasetGenerator(cache_folder=None)
+        dataset_generator.url_requester = counting_requester
+        dataset_generator.generate_netCDF4_dataset(datetime_start, datetime_end,
+                                                   nc4_path=os.path.join(tmpdirname, "online.nc4"))
+
+        url_requester = NicedUrlRequest(cache_folder=cache_folder, cache_organizer=cache_organizer)
+
+        for crrt_request in counting_requester.list_requests:
+            if "2008-01-11" in crrt_request and "OSL" in crrt_request:
+                continue
+
+            with open(url_requester.path_in_cache(crrt_request), "wb") as fh:
+                fh.write(counting_requester.perform_request(crrt_request))
+
+        nc4_path = os.path.join(tmpdirname, "offline.nc4")
+        dataset_generator = DatasetGenerator(cache_folder=cache_folder, offline=True)
+        dict_statistics = dataset_generator.generate_netCDF4_dataset(datetime_start, datetime_end,
+                                                                     nc4_path=nc4_path, nbr_parse_processes=2)
+
+        assert dict_statistics["number_of_requests"] == 0
+        assert dict_statistics["number_of_segments"] == 2 * 7
+        assert [(crrt_job.station_id, crrt_job.segment_start) for crrt_job in dict_statistics["missing_segments"]] ==\
+            [("OSL", datetime.datetime(2008, 1, 11, 0, 0, tzinfo=pytz.utc))]
+
+        # the missing segment is left empty, the rest of the data is there
+        dataset_accessor = DatasetAccessor(path_to_NetCDF=nc4_path)
+
+        _, data_observation, _ = dataset_accessor.get_data("OSL",
+                                                           datetime.datetime(2008, 1, 12, 0, 0, tzinfo=pytz.utc),
+                                                           datetime.datetime(2008, 1, 13, 0, 0, tzinfo=pytz.utc))
+        assert np.all(data_observation == 1.0e37)
+
+        data_datetime, data_observation, _ =\
+            dataset_accessor.get_data("BGO",
+                                      datetime.datetime(2008, 1, 2, 0, 0, tzinfo=pytz.utc),
+                                      datetime.datetime(2008, 1, 31, 0, 0, tzinfo=pytz.utc))
+        np_timestamps = np.array([crrt_datetime.timestamp() for crrt_datetime in data_datetime])
+        correct_observation, _ = synthetic_water_levels("BGO", np_timestamps)
+        assert np.allclose(correct_observation, data_observation)
+
+        # the missing segment is not recorded as written: resuming online only fetches it
+        dataset_generator = DatasetGenerator(cache_folder=None)
+        dataset_generator.url_requester = CountingRequester()
+        dict_statistics = dataset_generator.generate_netCDF4_dataset(datetime_start, datetime_end,
+                                                                     nc4_path=nc4_path, resume=True)
+        assert dict_statistics["number_of_segments"] == 1
+        assert not os.path.isfile(nc4_path + ".journal")
@@ -27,12 +27,64 @@ def assert_strict_monotonic(array, list_dimensions=None):
             raise ValueError("Array non stricly monotonic on dim {}".format(dim))
 
 
+class SortedArrayIndex():
+    """Index lookups in a 1D strictly increasing array. The monotonicity is
+    checked once at construction, so that many lookups can be performed
+    on the same array at O(log n) cost each."""
+
+    def __init__(self, np_array):
+        """
+        Input:
+            - np_array: numpy array in which to look, should be strictly
+                increasing and 1D.
+        Can raise:
+            a ValueError if np_array is not strictly increasing.
+        """
+
+        ras(isinstance(np_array, np.ndarray))
+        np_array = np_array.squeeze()
+        ras(len(np_array.shape) == 1)
+        ras(np_array.shape[0] > 0)
+
+        assert_strict_monotonic(np_array)
+
+        if np_array.shape[0] > 1 and np_array[-1] < np_array[0]:
+            raise ValueError("Array is strictly decreasing, expected strictly increasing")
+
+        self.np_array = np_array
+
+    def find_index_first_greater_or_equal(self, values, tol=1e-6):
+        """Find the index of the first entry of the array that is
+        greater or equal than each of the values.
+        Input:
+            - values: the value, or array of values, to use as a reference
+                for comparison.
+            - tol: a tolerance for performing the comparison.
+        Output:
+            - the index (if values is a scalar) or array of indexes (if values is
+                an array) of the first entry that is greater or equal to each value.
+        If no valid entry for any of the values, raise a ValueError.
+        """
+
+        np_values = np.asarray(values)
+
+        if np.any(self.np_array[-1] < np_values):
+            raise ValueError("no entry greater or equal than the asked value")
+
+        indexes = np.searchsorted(self.np_array, np_values - tol, side="left")
+
+        if np_values.ndim == 0:
+            return int(indexes)
+        else:
+            return indexes
+
+
 def find_index_first_greater_or_equal(np_array, value, tol=1e-6):
     """Find the index of the first value of np_array that is
     greater or equal than value.
     Input:
         - np_array: numpy array in which to look, should
-            be monotonic and 1D.
+            be strictly increasing and 1D.
         - value: the value to use as a reference for
             comparison.
         - tol: a tolerance for performing the comparison.
@@ -40,17 +92,38 @@ def find_index_first_greater_or_equal(np_array, value, tol=1e-6):
         - the index of the first entry that is greater
             or equal to value.
     If no valid value, raise an error.
+    When performing several lookups on the same array, prefer using a
+    SortedArrayIndex, that checks the array only once.
+    """
+
+    return SortedArrayIndex(np_array).find_index_first_greater_or_equal(value, tol=tol)
+
+
+def values_on_regular_grid(grid_start, grid_step, grid_length, np_positions, np_values, fill_value,
+                           dtype=np.float32):
+    """Scatter values known at some positions onto a regular grid.
+    Input:
+        - grid_start, grid_step, grid_length: the grid is
+            grid_start + grid_step * [0, 1, ..., grid_length - 1].
+        - np_positions: numpy array, the positions at which the values are known.
+        - np_values: numpy array, the values at the corresponding positions.
+        - fill_value: the value to use on grid points where no value is known.
+        - dtype: the dtype of the output.
+    Output:
+        - a numpy array of length grid_length, containing the values at the grid points
+            and fill_value elsewhere. Values at positions that are not on the grid are
+            ignored.
     """
 
-    ras(isinstance(np_array, np.ndarray))
-    np_array = np_array.squeeze()
-    ras(len(np_array.shape) == 1)
+    np_positions = np.asarray(np_positions)
+    np_values = np.asarray(np_values)
+    ras(np_positions.shape == np_values.shape)
 
-    assert_strict_monotonic(np_array)
+    np_grid_values = np.full((grid_length,), fill_value, dtype=dtype)
 
-    if np_array[-1] < value:
-        raise ValueError("no entry greater or equal than the asked value")
+    np_indexes, np_remainders = np.divmod(np_positions - grid_start, grid_step)
+    np_valid = (np_remainders == 0) & (np_indexes >= 0) & (np_indexes < grid_length)
 
-    first_index = np.argmax(np_array >= value - tol)
+    np_grid_values[np_indexes[np_valid]] = np_values[np_valid]
 
-    return first_index
+    return np_grid_values
@@ -2,7 +2,10 @@
 
 import numpy as np
 
-from kartverket_stormsurge.helper.arrays import find_index_first_greater_or_equal
+import pytest
+
+from kartverket_stormsurge.helper.arrays import find_index_first_greater_or_equal, SortedArrayIndex, \
+    values_on_regular_grid
 
 def test_find_index_first_greater_or_equal_1():
     array_to_check = np.array([1.0, 2.0, 3.0])
@@ -11,3 +14,34 @@ def test_find_index_first_greater_or_equal_1():
     assert find_index_first_greater_or_equal(array_to_check, 1.0) == 0
     assert find_index_first_greater_or_equal(array_to_check, 1.2) == 1
     assert find_index_first_greater_or_equal(array_to_check, 2.0) == 1
+
+
+def test_sorted_array_index_vector():
+    array_to_check = np.array([1.0, 2.0, 3.0, 5.0])
+    sorted_array_index = SortedArrayIndex(array_to_check)
+
+    assert sorted_array_index.find_index_first_greater_or_equal(2.0) == 1
+    assert list(sorted_array_index.find_index_first_greater_or_equal([-5.0, 1.0, 1.2, 2.0, 4.0, 5.0])) ==\
+        [0, 0, 1, 1, 3, 3]
+
+    with pytest.raises(ValueError):
+        sorted_array_index.find_index_first_greater_or_equal([1.0, 6.0])
+
+
+def test_sorted_array_index_not_increasing():
+    with pytest.raises(ValueError):
+        SortedArrayIndex(np.array([1.0, 2.0, 2.0]))
+
+    with pytest.raises(ValueError):
+        SortedArrayIndex(np.array([3.0, 2.0, 1.0]))
+
+
+def test_values_on_regular_grid_1():
+    np_positions = np.array([100, 110, 115, 130, 150, 90])
+    np_values = np.array([1.0, 2.0, 3.0, 4.0, 5.0, 6.0])
+
+    result = values_on_regular_grid(100, 10, 4, np_positions, np_values, 1.0e37)
+
+    # 115 is not on the grid, 150 and 90 are outside of it
+    assert result.dtype == np.float32
+    assert list(result) == [1.0, 2.0, np.float32(1.0e37), 4.0]
@@ -1,6 +1,9 @@
 import datetime
+import dateutil.parser
 import pytz
 
+import numpy as np
+
 from kartverket_stormsurge.helper.raise_assert import ras
 
 
@@ -68,3 +71,43 @@ def datetime_segments(datetime_start, datetime_end, step_timedelta):
             yield (crrt_segment_start, crrt_segment_end)
             crrt_segment_start += step_timedelta
             crrt_segment_end += step_timedelta
+
+
+def timestamps_range(datetime_start, datetime_end, step_timedelta):
+    """Vectorized counterpart of datetime_range: the POSIX timestamps in the range
+    [datetime_start; datetime_end[, with step step_timedelta, as an int64 numpy array.
+    The step should be an integer number of seconds."""
+    assert_is_utc_datetime(datetime_start)
+    assert_is_utc_datetime(datetime_end)
+    ras(isinstance(step_timedelta, datetime.timedelta))
+    ras(datetime_start < datetime_end)
+    ras(step_timedelta > datetime.timedelta(0))
+
+    step_s = step_timedelta.total_seconds()
+    ras(step_s == int(step_s))
+
+    timestamp_start = int(datetime_start.timestamp())
+    ras(timestamp_start == datetime_start.timestamp())
+    number_of_entries = -(-(datetime_end - datetime_start) // step_timedelta)
+
+    return timestamp_start + int(step_s) * np.arange(number_of_entries, dtype=np.int64)
+
+
+def iso_utc_strings_to_timestamps(list_iso_strings):
+    """Convert a list of ISO 8601 strings with UTC offset, as returned by the API (for
+    example '2008-12-15T09:00:00+00:00'), into an int64 numpy array of POSIX timestamps.
+    The conversion is vectorized when all strings are explicitly UTC, and falls back to
+    parsing each string individually otherwise."""
+
+    if len(list_iso_strings) == 0:
+        return np.zeros((0,), dtype=np.int64)
+
+    np_strings = np.asarray(list_iso_strings, dtype=str)
+
+    if np.all(np.char.endswith(np_strings, "+00:00") & (np.char.str_len(np_strings) == 25)):
+        # truncating the strings drops the UTC offset
+        return np_strings.astype("U19").astype("datetime64[s]").astype(np.int64)
+
+    else:
+        return np.array([int(dateutil.parser.isoparse(crrt_string).astimezone(pytz.utc).timestamp())
+                         for crrt_string in list_iso_strings], dtype=np.int64)
@@ -1,8 +1,12 @@
 import datetime
 import pytz
 
+import numpy as np
+
 from kartverket_stormsurge.helper.datetimes import datetime_range
 from kartverket_stormsurge.helper.datetimes import datetime_segments
+from kartverket_stormsurge.helper.datetimes import timestamps_range
+from kartverket_stormsurge.helper.datetimes import iso_utc_strings_to_timestamps
 
 
 def test_datetime_range_1():
@@ -63,3 +67,40 @@ def test_datetime_segments_2():
                       ]
 
     assert list(result) == correct_result
+
+
+def test_timestamps_range_1():
+    datetime_start = datetime.datetime(2020, 1, 1, 0, 0, 0, tzinfo=pytz.utc)
+    datetime_end = datetime.datetime(2020, 1, 1, 0, 25, 0, tzinfo=pytz.utc)
+    step_timedelta = datetime.timedelta(minutes=10)
+
+    result = timestamps_range(datetime_start, datetime_end, step_timedelta)
+
+    correct_result = [crrt_datetime.timestamp() for crrt_datetime in
+                      datetime_range(datetime_start, datetime_end, step_timedelta)]
+
+    assert result.dtype == np.int64
+    assert list(result) == correct_result
+
+
+def test_iso_utc_strings_to_timestamps_1():
+    list_iso_strings = ["2008-12-15T09:00:00+00:00", "2008-12-15T09:10:00+00:00", "2008-12-15T09:20:00+00:00"]
+
+    result = iso_utc_strings_to_timestamps(list_iso_strings)
+
+    correct_result = [datetime.datetime(2008, 12, 15, 9, crrt_minute, 0, tzinfo=pytz.utc).timestamp()
+                      for crrt_minute in [0, 10, 20]]
+
+    assert list(result) == correct_result
+
+
+def test_iso_utc_strings_to_timestamps_2():
+    # other offset formats go through the slow path, and give the same result
+    list_iso_strings = ["2008-12-15T10:00:00+01:00", "2008-12-15T09:10:00Z"]
+
+    result = iso_utc_strings_to_timestamps(list_iso_strings)
+
+    correct_result = [datetime.datetime(2008, 12, 15, 9, crrt_minute, 0, tzinfo=pytz.utc).timestamp()
+                      for crrt_minute in [0, 10]]
+
+    assert list(result) == correct_result
@@ -0,0 +1,92 @@
+"""A simple append only progress journal, to make long running jobs resumable."""
+
+import os
+import json
+import logging
+
+from kartverket_stormsurge.helper.raise_assert import ras
+
+
+class ProgressJournal():
+    """A progress journal stored as a JSON lines file: the first line is a header describing
+    the job, and each following line lists some work items that are completed. Lines are only
+    appended and flushed to disk, so that a crash loses at most the line being written, which
+    is then ignored when loading the journal."""
+
+    def __init__(self, path_to_journal):
+        """
+        - path_to_journal: the path to the journal file.
+        """
+        self.path_to_journal = path_to_journal
+
+    def exists(self):
+        return os.path.isfile(self.path_to_journal)
+
+    def start(self, dict_header):
+        """Start a new journal, overwriting any previous one.
+        Input:
+            - dict_header: a JSON serializable dict describing the job.
+        """
+        with open(self.path_to_journal, "w") as fh:
+            fh.write(json.dumps({"header": dict_header}) + "\n")
+            fh.flush()
+            os.fsync(fh.fileno())
+
+    def load(self):
+        """Load the journal.
+        Output:
+            - (dict_header, set_completed): the header the journal was started with, and the
+                set of completed items, each item as a tuple.
+        """
+
+        ras(self.exists(), "no journal at {}".format(self.path_to_journal))
+
+        dict_header = None
+        set_completed = set()
+
+        with open(self.path_to_journal, "r") as fh:
+            for crrt_line_number, crrt_line in enumerate(fh):
+                if crrt_line.strip() == "":
+                    continue
+
+                try:
+                    dict_line = json.loads(crrt_line)
+                except json.JSONDecodeError:
+                    # the last line may be incomplete if the job crashed while writing it
+                    logging.warning("ignoring corrupted line {} of journal {}".format(crrt_line_number,
+                                                                                     self.path_to_journal))
+                    continue
+
+                if crrt_line_number == 0:
+                    dict_header = dict_line["header"]
+                else:
+                    set_completed.update(tuple(crrt_item) for crrt_item in dict_line["completed"])
+
+        ras(dict_header is not None, "journal {} has no header".format(self.path_to_journal))
+
+        # terminate an incomplete last line, so that the next records are not appended to it
+        with open(self.path_to_journal, "rb+") as fh:
+            fh.seek(-1, os.SEEK_END)
+            if fh.read(1) != b"\n":
+                fh.write(b"\n")
+
+        return(dict_header, set_completed)
+
+    def record(self, list_completed):
+        """Record some items as completed. The caller should make sure that the corresponding
+        work is safely on disk before calling this.
+        Input:
+            - list_completed: list of JSON serializable tuples identifying the items.
+        """
+
+        if len(list_completed) == 0:
+            return
+
+        with open(self.path_to_journal, "a") as fh:
+            fh.write(json.dumps({"completed": [list(crrt_item) for crrt_item in list_completed]}) + "\n")
+            fh.flush()
+            os.fsync(fh.fileno())
+
+    def remove(self):
+        if self.exists():
+            os.remove(self.path_to_journal)
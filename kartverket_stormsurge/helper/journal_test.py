@@ -0,0 +1,34 @@
+"""tests"""
+
+import os
+import tempfile
+
+from kartverket_stormsurge.helper.journal import ProgressJournal
+
+
+def test_journal_roundtrip_and_truncated_line():
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        journal = ProgressJournal(os.path.join(tmpdirname, "job.journal"))
+        assert not journal.exists()
+
+        journal.start({"job": "test", "list_items": ["a", "b"]})
+        journal.record([(0, 10), (0, 20)])
+        journal.record([])
+        journal.record([(1, 10)])
+
+        # simulate a crash in the middle of writing a line
+        with open(journal.path_to_journal, "a") as fh:
+            fh.write('{"completed": [[1, 2')
+
+        dict_header, set_completed = journal.load()
+
+        assert dict_header == {"job": "test", "list_items": ["a", "b"]}
+        assert set_completed == {(0, 10), (0, 20), (1, 10)}
+
+        # records after the truncated line are not lost
+        journal.record([(1, 20)])
+        _, set_completed = journal.load()
+        assert set_completed == {(0, 10), (0, 20), (1, 10), (1, 20)}
+
+        journal.remove()
+        assert not journal.exists()
@@ -0,0 +1,141 @@
+"""A staged fetch / parse / write pipeline, with bounded queues between the stages."""
+
+import queue
+import threading
+import concurrent.futures
+
+from kartverket_stormsurge.helper.raise_assert import ras
+
+
+def put_unless_stopped(queue_out, item, stop_event, poll_time_s=0.1):
+    """Put item in queue_out, blocking while the queue is full, unless stop_event gets set.
+    Output:
+        - True if the item was put in the queue, False if stopped before."""
+    while not stop_event.is_set():
+        try:
+            queue_out.put(item, timeout=poll_time_s)
+            return True
+        except queue.Full:
+            pass
+
+    return False
+
+
+def run_fetch_parse_write_pipeline(list_jobs, function_fetch, function_parse, function_write,
+                                   nbr_fetch_workers=1, nbr_parse_processes=0, queue_size=64,
+                                   function_progress=None):
+    """Process each job through three stages:
+
+    - fetch: function_fetch(job) -> raw, run in nbr_fetch_workers threads, that push their results
+        in a bounded queue of size queue_size.
+    - parse: function_parse(raw) -> parsed, run in a pool of nbr_parse_processes processes, with at
+        most 2 * nbr_parse_processes parses in flight. If nbr_parse_processes is 0, parse in the
+        writer thread instead. When using processes, function_parse and its input and output
+        must be picklable.
+    - write: function_write(job, parsed), always run in the calling thread, in the order the parses
+        complete, so that it is the only stage touching the output.
+
+    The memory used by the pipeline is bounded by the queue size and the number of parses in flight,
+    whatever the number of jobs. The first exception in any stage stops the pipeline and is raised.
+
+    Input:
+        - list_jobs: the jobs to process.
+        - function_fetch, function_parse, function_write: the stages, see above.
+        - nbr_fetch_workers: number of fetch threads.
+        - nbr_parse_processes: number of parse processes, 0 to parse in the calling thread.
+        - queue_size: the maximum number of fetched jobs waiting to be parsed.
+        - function_progress: if not None, called without arguments each time a job is written.
+    """
+
+    ras(nbr_fetch_workers >= 1)
+    ras(nbr_parse_processes >= 0)
+    ras(queue_size >= 1)
+
+    queue_jobs = queue.Queue()
+    for crrt_job in list_jobs:
+        queue_jobs.put(crrt_job)
+
+    queue_fetched = queue.Queue(maxsize=queue_size)
+    stop_event = threading.Event()
+
+    def fetch_worker():
+        while not stop_event.is_set():
+            try:
+                crrt_job = queue_jobs.get_nowait()
+            except queue.Empty:
+                break
+
+            try:
+                crrt_item = (crrt_job, function_fetch(crrt_job), None)
+            except Exception as crrt_exception:
+                crrt_item = (crrt_job, None, crrt_exception)
+
+            put_unless_stopped(queue_fetched, crrt_item, stop_event)
+
+            if crrt_item[2] is not None:
+                break
+
+        # signal that this worker is done
+        put_unless_stopped(queue_fetched, None, stop_event)
+
+    def write(crrt_job, crrt_parsed):
+        function_write(crrt_job, crrt_parsed)
+        if function_progress is not None:
+            function_progress()
+
+    # create the processes before starting any thread, as forking a multi threaded process is risky
+    if nbr_parse_processes > 0:
+        executor = concurrent.futures.ProcessPoolExecutor(max_workers=nbr_parse_processes)
+    else:
+        executor = None
+
+    max_parses_in_flight = 2 * nbr_parse_processes
+    dict_pending_parses = {}
+
+    list_fetch_threads = [threading.Thread(target=fetch_worker, daemon=True) for _ in range(nbr_fetch_workers)]
+    for crrt_thread in list_fetch_threads:
+        crrt_thread.start()
+
+    nbr_finished_fetch_workers = 0
+
+    try:
+        while True:
+            # write whatever has been parsed already, without blocking
+            for crrt_future in [crrt_future for crrt_future in dict_pending_parses if crrt_future.done()]:
+                write(dict_pending_parses.pop(crrt_future), crrt_future.result())
+
+            if nbr_finished_fetch_workers == nbr_fetch_workers or len(dict_pending_parses) >= max_parses_in_flight > 0:
+                if len(dict_pending_parses) == 0:
+                    break
+
+                concurrent.futures.wait(dict_pending_parses, return_when=concurrent.futures.FIRST_COMPLETED)
+                continue
+
+            try:
+                crrt_item = queue_fetched.get(timeout=0.1)
+            except queue.Empty:
+                continue
+
+            if crrt_item is None:
+                nbr_finished_fetch_workers += 1
+                continue
+
+            crrt_job, crrt_raw, crrt_exception = crrt_item
+
+            if crrt_exception is not None:
+                raise crrt_exception
+
+            if executor is None:
+                write(crrt_job, function_parse(crrt_raw))
+            else:
+                dict_pending_parses[executor.submit(function_parse, crrt_raw)] = crrt_job
+
+    finally:
+        # on error, let the fetch threads stop at their next job; they are daemons, so do not wait
+        # for them if they are stuck in a request
+        stop_event.set()
+
+        if executor is not None:
+            for crrt_future in dict_pending_parses:
+                crrt_future.cancel()
+            executor.shutdown(wait=True)
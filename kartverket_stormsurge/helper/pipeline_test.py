@@ -0,0 +1,35 @@
+"""tests"""
+
+import pytest
+
+from kartverket_stormsurge.helper.pipeline import run_fetch_parse_write_pipeline
+
+
+def square(value):
+    return value * value
+
+
+def test_pipeline_all_jobs_written_once():
+    for nbr_fetch_workers, nbr_parse_processes in [(1, 0), (4, 0), (3, 2)]:
+        dict_written = {}
+
+        def write(job, parsed):
+            assert job not in dict_written
+            dict_written[job] = parsed
+
+        run_fetch_parse_write_pipeline(list(range(100)), lambda job: job + 1, square, write,
+                                       nbr_fetch_workers=nbr_fetch_workers, nbr_parse_processes=nbr_parse_processes,
+                                       queue_size=3)
+
+        assert dict_written == {job: (job + 1)**2 for job in range(100)}
+
+
+def test_pipeline_error():
+    def fetch(job):
+        if job == 50:
+            raise ValueError("failed fetch")
+        return job
+
+    with pytest.raises(ValueError):
+        run_fetch_parse_write_pipeline(list(range(100)), fetch, square, lambda job, parsed: None,
+                                       nbr_fetch_workers=2, queue_size=3)
@@ -0,0 +1,70 @@
+"""A thread safe rate limiter, to share a request budget between several workers."""
+
+import time
+import threading
+
+from kartverket_stormsurge.helper.raise_assert import ras
+
+
+class TokenBucketRateLimiter():
+    """A token bucket rate limiter: tokens are refilled at a rate of one every
+    min_wait_time_s, up to a capacity of burst tokens, and each request consumes
+    one token. With the default burst of 1, this guarantees at least min_wait_time_s
+    between any two requests, whatever the number of threads drawing from the limiter.
+    Callers that cannot get a token immediately reserve the next one, so that they are
+    served in order and the waits are not wasted polling."""
+
+    def __init__(self, min_wait_time_s=1, burst=1):
+        """
+        - min_wait_time_s: the time needed to refill one token, i.e. the minimum
+            average time interval between requests. 0 or less means no limit.
+        - burst: the capacity of the bucket, i.e. the maximum number of requests
+            that can be performed back to back after an idle period.
+        """
+
+        ras(burst >= 1)
+
+        self.min_wait_time_s = min_wait_time_s
+        self.burst = burst
+
+        self.lock = threading.Lock()
+        self.tokens = float(burst)
+        self.time_last_refill = time.monotonic()
+
+    def refill(self, now):
+        """Add the tokens accumulated since the last refill; should be called with the lock held."""
+        if self.min_wait_time_s > 0:
+            self.tokens = min(float(self.burst), self.tokens + (now - self.time_last_refill) / self.min_wait_time_s)
+        else:
+            self.tokens = float(self.burst)
+
+        self.time_last_refill = now
+
+    def reserve(self):
+        """Take a token, possibly in advance.
+        Output:
+            - the time to wait (in seconds, 0 if none) before the token is actually available.
+        """
+
+        with self.lock:
+            self.refill(time.monotonic())
+
+            self.tokens -= 1.0
+
+            if self.tokens >= 0 or self.min_wait_time_s <= 0:
+                return 0.0
+            else:
+                return -self.tokens * self.min_wait_time_s
+
+    def acquire(self):
+        """Block until a token is available for the caller.
+        Output:
+            - the time spent waiting, in seconds.
+        """
+
+        time_to_wait = self.reserve()
+
+        if time_to_wait > 0:
+            time.sleep(time_to_wait)
+
+        return time_to_wait
@@ -0,0 +1,51 @@
+"""tests"""
+
+import time
+import threading
+
+from kartverket_stormsurge.helper.rate_limiter import TokenBucketRateLimiter
+
+
+def test_rate_limiter_concurrent_spacing():
+    """several threads drawing from the same limiter never go above the rate."""
+    min_wait_time_s = 0.05
+    rate_limiter = TokenBucketRateLimiter(min_wait_time_s=min_wait_time_s)
+
+    list_times = []
+    lock_times = threading.Lock()
+
+    def worker():
+        for _ in range(5):
+            rate_limiter.acquire()
+            with lock_times:
+                list_times.append(time.monotonic())
+
+    list_threads = [threading.Thread(target=worker) for _ in range(4)]
+    for crrt_thread in list_threads:
+        crrt_thread.start()
+    for crrt_thread in list_threads:
+        crrt_thread.join()
+
+    list_times = sorted(list_times)
+    assert len(list_times) == 20
+
+    # allow for a bit of scheduling jitter on each individual interval, but none on the total
+    list_intervals = [crrt_next - crrt_previous for crrt_previous, crrt_next in zip(list_times[:-1], list_times[1:])]
+    assert min(list_intervals) > 0.5 * min_wait_time_s
+    assert list_times[-1] - list_times[0] > 19 * min_wait_time_s * 0.95
+
+
+def test_rate_limiter_burst():
+    rate_limiter = TokenBucketRateLimiter(min_wait_time_s=10.0, burst=3)
+
+    assert [rate_limiter.reserve() for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert rate_limiter.reserve() > 9.0
+
+
+def test_rate_limiter_no_limit():
+    rate_limiter = TokenBucketRateLimiter(min_wait_time_s=0)
+
+    time_start = time.time()
+    for _ in range(100):
+        assert rate_limiter.acquire() == 0.0
+    assert time.time() - time_start < 0.5
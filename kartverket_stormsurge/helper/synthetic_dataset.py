@@ -0,0 +1,144 @@
+"""Helpers to generate synthetic storm surge data, for testing and benchmarking
+without having to query the Kartverket API."""
+
+import datetime
+
+import numpy as np
+import netCDF4 as nc4
+
+from kartverket_stormsurge.helper.raise_assert import ras
+from kartverket_stormsurge.helper.datetimes import assert_is_utc_datetime
+
+
+# period of the main lunar semi-diurnal tide component, M2
+M2_PERIOD_S = 12.4206012 * 3600.0
+
+
+def synthetic_station_seed(station_id):
+    """A deterministic seed from a station ID (python's hash is salted, so
+    cannot be used for this)."""
+    return sum((ind + 1) * ord(crrt_char) for ind, crrt_char in enumerate(station_id))
+
+
+def synthetic_water_levels(station_id, np_timestamps):
+    """Deterministic synthetic water levels for a given station.
+    Input:
+        - station_id: the station ID, for example 'OSL'.
+        - np_timestamps: numpy array of POSIX timestamps.
+    Output:
+        - (np_observation, np_prediction): float32 arrays of water levels in cm,
+            rounded to 0.1 cm as in the data provided by the API.
+    """
+
+    seed = synthetic_station_seed(station_id)
+    np_timestamps = np.asarray(np_timestamps, dtype=np.float64)
+
+    mean_level = 100.0 + seed % 50
+    amplitude = 30.0 + seed % 70
+    phase = (seed % 360) * np.pi / 180.0
+
+    np_prediction = mean_level + amplitude * np.sin(2.0 * np.pi * np_timestamps / M2_PERIOD_S + phase)
+    np_surge = 20.0 * np.sin(2.0 * np.pi * np_timestamps / (4.3 * 86400.0) + phase) +\
+        5.0 * np.sin(np_timestamps / 7919.0 + seed)
+    np_observation = np_prediction + np_surge
+
+    return(np.round(np_observation, 1).astype(np.float32), np.round(np_prediction, 1).astype(np.float32))
+
+
+def write_synthetic_netCDF4_dump(nc4_path, list_station_ids, datetime_start, datetime_end,
+                                 resolution_timedelta=datetime.timedelta(minutes=10), fill_value=1.0e37):
+    """Write a synthetic netCDF4 dump, with the same layout as the one produced by the
+    DatasetGenerator, and data from synthetic_water_levels.
+    Input:
+        - nc4_path: where to write the dump.
+        - list_station_ids: the list of stations to include.
+        - datetime_start, datetime_end: the time range [datetime_start; datetime_end[ of the time base.
+        - resolution_timedelta: the time resolution of the time base.
+        - fill_value: the value to use where there is no data.
+    Each station gets data on the middle 80% of the time base, and fill_value elsewhere,
+    to mimic stations that do not cover the whole time range.
+    """
+
+    assert_is_utc_datetime(datetime_start)
+    assert_is_utc_datetime(datetime_end)
+    ras(datetime_start < datetime_end)
+
+    step_s = int(resolution_timedelta.total_seconds())
+    np_timestamps = np.arange(int(datetime_start.timestamp()), int(datetime_end.timestamp()), step_s, dtype=np.int64)
+    number_of_time_entries = len(np_timestamps)
+
+    first_valid_index = number_of_time_entries // 10
+    last_valid_index = number_of_time_entries - number_of_time_entries // 10
+
+    with nc4.Dataset(nc4_path, "w", format="NETCDF4") as nc4_fh:
+        nc4_fh.set_auto_mask(False)
+
+        nc4_fh.title = "synthetic storm surge data"
+
+        _ = nc4_fh.createDimension('station', len(list_station_ids))
+        _ = nc4_fh.createDimension('time', number_of_time_entries)
+
+        stationid = nc4_fh.createVariable("stationid", str, ('station'))
+        latitude = nc4_fh.createVariable('latitude', 'f4', ('station'))
+        longitude = nc4_fh.createVariable('longitude', 'f4', ('station'))
+        timestamps = nc4_fh.createVariable('timestamps', 'i8', ('time'))
+        observation = nc4_fh.createVariable('observation', 'f4', ('station', 'time'))
+        prediction = nc4_fh.createVariable('prediction', 'f4', ('station', 'time'))
+        timestamp_start = nc4_fh.createVariable('timestamp_start', 'i8', ('station'))
+        timestamp_end = nc4_fh.createVariable('timestamp_end', 'i8', ('station'))
+
+        timestamps[:] = np_timestamps
+
+        for ind, crrt_station_id in enumerate(list_station_ids):
+            stationid[ind] = crrt_station_id
+            latitude[ind] = 58.0 + ind * 0.5
+            longitude[ind] = 5.0 + ind * 0.5
+            timestamp_start[ind] = np_timestamps[first_valid_index]
+            timestamp_end[ind] = np_timestamps[last_valid_index - 1]
+
+            np_observation, np_prediction = synthetic_water_levels(crrt_station_id, np_timestamps)
+            np_observation[:first_valid_index] = fill_value
+            np_observation[last_valid_index:] = fill_value
+            np_prediction[:first_valid_index] = fill_value
+            np_prediction[last_valid_index:] = fill_value
+
+            observation[ind, :] = np_observation
+            prediction[ind, :] = np_prediction
+
+
+def synthetic_stationdata_xml(station_id, datetime_start, datetime_end,
+                              resolution_timedelta=datetime.timedelta(minutes=10)):
+    """Generate a synthetic answer to a stationdata request, following the schema
+    of the Kartverket API, with data from synthetic_water_levels on the time range
+    [datetime_start; datetime_end] (both included, as the API does).
+    Output:
+        - the answer, as bytes.
+    """
+
+    assert_is_utc_datetime(datetime_start)
+    assert_is_utc_datetime(datetime_end)
+    ras(datetime_start <= datetime_end)
+
+    step_s = int(resolution_timedelta.total_seconds())
+    np_timestamps = np.arange(int(datetime_start.timestamp()), int(datetime_end.timestamp()) + 1, step_s,
+                              dtype=np.int64)
+    np_observation, np_prediction = synthetic_water_levels(station_id, np_timestamps)
+
+    list_times = [datetime.datetime.fromtimestamp(int(crrt_timestamp), datetime.timezone.utc).isoformat()
+                  for crrt_timestamp in np_timestamps]
+
+    list_lines = ['<?xml version="1.0" encoding="UTF-8"?>',
+                  '<tide>',
+                  '<stationdata>',
+                  '<location name="{0}" code="{0}" latitude="60.000000" longitude="5.000000">'.format(station_id)]
+
+    for crrt_type, crrt_flag, np_values in [("observation", "obs", np_observation),
+                                            ("prediction", "pre", np_prediction)]:
+        list_lines.append('<data type="{}" unit="cm" reflevelcode="CD">'.format(crrt_type))
+        list_lines.extend('<waterlevel value="{:.1f}" time="{}" flag="{}"/>'.format(crrt_value, crrt_time, crrt_flag)
+                          for crrt_value, crrt_time in zip(np_values, list_times))
+        list_lines.append('</data>')
+
+    list_lines.extend(['</location>', '</stationdata>', '</tide>'])
+
+    return "\n".join(list_lines).encode("utf-8")
@@ -6,18 +6,27 @@ import time
 import datetime
 from pathlib import Path
 import logging
+import threading
+
+from kartverket_stormsurge.helper.rate_limiter import TokenBucketRateLimiter
 
 # NOTE: for now caching is done by hand in the class; consider using established packages such as:
 # http://www.grantjenks.com/docs/diskcache/tutorial.html
 # https://fcache.readthedocs.io/en/stable/
 
 
+class NotInCacheError(ValueError):
+    """Raised when a request is asked from the cache only, and it is not there."""
+    pass
+
+
 class NicedUrlRequest():
     """A simple wrapper to nice url requests.
-    Make sure that the caller has to wait for a minimum amount of time between requests."""
+    Make sure that the caller has to wait for a minimum amount of time between requests.
+    The requester can be shared between threads: all requests draw from the same rate limiter."""
 
     def __init__(self, min_wait_time_s=1, cache_folder="default", cache_organizer=None,
-                 request_callback=None):
+                 request_callback=None, rate_limiter=None):
         """
         - min_wait_time_s: minimum time interval between requests.
         - cache_folder: properties for caching the data. Can be: None (no caching),
@@ -32,11 +41,21 @@ class NicedUrlRequest():
             it is let to the user to implement.
         - request_callback: a callback function to be called if a url request is performed.
             By default None (i.e., nothing).
+        - rate_limiter: the rate limiter to draw from before each url request. By default None,
+            i.e. use a TokenBucketRateLimiter enforcing min_wait_time_s between requests. A rate
+            limiter can be shared between several NicedUrlRequest instances.
         """
 
         self.min_wait_time_s = min_wait_time_s
         self.time_last = None
 
+        if rate_limiter is None:
+            rate_limiter = TokenBucketRateLimiter(min_wait_time_s=min_wait_time_s)
+        self.rate_limiter = rate_limiter
+
+        self.lock_statistics = threading.Lock()
+        self.number_of_requests_performed = 0
+
         # initialize with the start time -min_wait_time_s, so that immediately ready to use
         self.update_time()
         self.time_last -= self.min_wait_time_s
@@ -119,11 +138,11 @@ class NicedUrlRequest():
                 path_within_cache = self.cache_organizer(request) + "/"
 
                 if not os.path.exists(self.cache_folder + path_within_cache):
-                    Path(self.cache_folder + path_within_cache).mkdir(parents=True)
+                    Path(self.cache_folder + path_within_cache).mkdir(parents=True, exist_ok=True)
 
                 return(self.cache_folder + path_within_cache + request.replace("/", ""))
 
-    def perform_request(self, request, ignore_cache=False, allow_caching=True, max_retries=60):
+    def perform_request(self, request, ignore_cache=False, allow_caching=True, max_retries=60, cache_only=False):
         """Perform the request request, after checking if the data are available in cache,
         and making sure we are not too hard on the server.
 
@@ -136,6 +155,8 @@ class NicedUrlRequest():
             - allow_caching: boolean, if True allow caching, if False not, default True.
             - max_retries: the maximum number of retries. Default is 10. Wait 10 second between
                 consecutive retries.
+            - cache_only: boolean, if True never perform the url request, and raise a NotInCacheError
+                if the request is not available in cache. Default False.
 
         Output:
             - status: the status code
@@ -159,13 +180,12 @@ class NicedUrlRequest():
             with open(self.path_in_cache(request), 'rb') as fh:
                 html_string = fh.read()
 
-        else:
-            remaining_sleep = self.min_wait_time_s - self.elapsed_since_last_request()
-            logging.info("remaining_sleep (negative is none needed): {}".format(remaining_sleep))
+        elif cache_only:
+            raise NotInCacheError("request {} is not available in cache".format(request))
 
-            if remaining_sleep > 0:
-                logging.info("sleeping")
-                time.sleep(remaining_sleep)
+        else:
+            time_slept = self.rate_limiter.acquire()
+            logging.info("slept {} s to respect the request rate".format(time_slept))
 
             if self.request_callback is not None:
                 logging.info("call request callback")
@@ -174,6 +194,9 @@ class NicedUrlRequest():
             logging.info("perform request")
             self.update_time()
 
+            with self.lock_statistics:
+                self.number_of_requests_performed += 1
+
             number_retries_left = max_retries
             status = None
 
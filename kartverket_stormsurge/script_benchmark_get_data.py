@@ -0,0 +1,87 @@
+"""Benchmark DatasetAccessor.get_data on a synthetic full size dump (1970-2020), comparing
+the previous full row read to the current partial hyperslab read, for one hour, one month
+and full range queries."""
+
+import os
+import time
+import tempfile
+import datetime
+import pytz
+
+import netCDF4 as nc4
+
+from kartverket_stormsurge.dataset_accessor import DatasetAccessor
+from kartverket_stormsurge.helper.arrays import find_index_first_greater_or_equal
+from kartverket_stormsurge.helper.synthetic_dataset import write_synthetic_netCDF4_dump
+
+list_station_ids = ["AAA", "BBB", "CCC", "DDD"]
+datetime_start_dump = datetime.datetime(1970, 1, 1, 0, 0, tzinfo=pytz.utc)
+datetime_end_dump = datetime.datetime(2020, 1, 1, 0, 0, tzinfo=pytz.utc)
+number_of_repetitions = 5
+
+dict_queries = {
+    "one hour": (datetime.datetime(2008, 1, 1, 0, 0, tzinfo=pytz.utc),
+                 datetime.datetime(2008, 1, 1, 1, 0, tzinfo=pytz.utc)),
+    "one month": (datetime.datetime(2008, 1, 1, 0, 0, tzinfo=pytz.utc),
+                  datetime.datetime(2008, 2, 1, 0, 0, tzinfo=pytz.utc)),
+    "full range": (datetime.datetime(1970, 1, 1, 0, 0, tzinfo=pytz.utc),
+                   datetime.datetime(2019, 12, 31, 0, 0, tzinfo=pytz.utc)),
+}
+
+
+def get_data_full_row_read(dataset_accessor, station_id, datetime_start, datetime_end):
+    """The get_data implementation before partial reads, kept here as the reference."""
+    nc4_index = dataset_accessor.dict_metadata[station_id]["station_index"]
+
+    timestamp_start = datetime_start.timestamp()
+    timestamp_end = datetime_end.timestamp()
+
+    with nc4.Dataset(dataset_accessor.path_to_NetCDF, "r", format="NETCDF4") as nc4_fh:
+        data_timestamp_full = nc4_fh["timestamps"][:]
+        data_observation_full = nc4_fh["observation"][nc4_index][:]
+        data_prediction_full = nc4_fh["prediction"][nc4_index][:]
+
+    first_index = find_index_first_greater_or_equal(data_timestamp_full, timestamp_start)
+    last_index = find_index_first_greater_or_equal(data_timestamp_full, timestamp_end) + 1
+
+    data_datetime = [datetime.datetime.fromtimestamp(crrt_timestamp, pytz.utc) for
+                     crrt_timestamp in data_timestamp_full[first_index:last_index]]
+    data_observation = data_observation_full[first_index:last_index]
+    data_prediction = data_prediction_full[first_index:last_index]
+
+    return(data_datetime, data_observation, data_prediction)
+
+
+def time_query(function_get_data, station_id, datetime_start, datetime_end):
+    """Median wall time of function_get_data over number_of_repetitions calls."""
+    list_durations = []
+
+    for _ in range(number_of_repetitions):
+        time_start = time.perf_counter()
+        function_get_data(station_id, datetime_start, datetime_end)
+        list_durations.append(time.perf_counter() - time_start)
+
+    return sorted(list_durations)[len(list_durations) // 2]
+
+
+with tempfile.TemporaryDirectory() as tmpdirname:
+    nc4_path = os.path.join(tmpdirname, "benchmark_get_data.nc4")
+
+    print("generate synthetic dump, this may take a little while...")
+    write_synthetic_netCDF4_dump(nc4_path, list_station_ids, datetime_start_dump, datetime_end_dump)
+
+    dataset_accessor = DatasetAccessor(path_to_NetCDF=nc4_path)
+
+    def function_before(station_id, datetime_start, datetime_end):
+        return get_data_full_row_read(dataset_accessor, station_id, datetime_start, datetime_end)
+
+    function_after = dataset_accessor.get_data
+
+    print("{:<12}{:>14}{:>14}{:>10}".format("query", "before [s]", "after [s]", "speedup"))
+
+    for crrt_query_name, (crrt_start, crrt_end) in dict_queries.items():
+        duration_before = time_query(function_before, "BBB", crrt_start, crrt_end)
+        duration_after = time_query(function_after, "BBB", crrt_start, crrt_end)
+
+        print("{:<12}{:>14.5f}{:>14.5f}{:>10.1f}".format(crrt_query_name, duration_before, duration_after,
+                                                         duration_before / duration_after))
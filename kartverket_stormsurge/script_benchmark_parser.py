@@ -0,0 +1,30 @@
+"""Benchmark the throughput of the stationdata parsers, on synthetic 5 days segments
+similar to the ones requested by the DatasetGenerator."""
+
+import time
+import datetime
+import pytz
+
+from kartverket_stormsurge.tideapi_parser import parse_stationdata_lxml, parse_stationdata_bs4
+from kartverket_stormsurge.helper.synthetic_dataset import synthetic_stationdata_xml
+
+number_of_segments = 200
+
+list_segments = []
+for crrt_segment_index in range(number_of_segments):
+    crrt_start = datetime.datetime(2008, 1, 1, 0, 0, tzinfo=pytz.utc) + crrt_segment_index * datetime.timedelta(days=5)
+    list_segments.append(synthetic_stationdata_xml("OSL", crrt_start, crrt_start + datetime.timedelta(days=5)))
+
+size_segments_MB = sum(len(crrt_segment) for crrt_segment in list_segments) / 2.0**20
+
+print("{:<8}{:>16}{:>12}".format("parser", "segments / s", "MB / s"))
+
+for crrt_name, crrt_parser in [("bs4", parse_stationdata_bs4), ("lxml", parse_stationdata_lxml)]:
+    time_start = time.perf_counter()
+
+    for crrt_segment in list_segments:
+        crrt_parser(crrt_segment)
+
+    duration = time.perf_counter() - time_start
+
+    print("{:<8}{:>16.1f}{:>12.2f}".format(crrt_name, number_of_segments / duration, size_segments_MB / duration))
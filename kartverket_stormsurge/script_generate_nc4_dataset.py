@@ -8,6 +8,9 @@ dataset_generator = DatasetGenerator()
 # example_kind = "full"
 example_kind = "short"
 
+# number of stations fetched concurrently; the request rate to the API is the same whatever this is
+nbr_workers = 4
+
 if example_kind == "full":
     start = datetime.datetime(1970, 1, 1, 0, 0, tzinfo=pytz.utc)
     end = datetime.datetime(2020, 6, 1, 0, 0, tzinfo=pytz.utc)
@@ -22,4 +25,6 @@ elif example_kind == "short":
 else:
     raise ValueError("unknown example_kind")
 
-dataset_generator.generate_netCDF4_dataset(start, end, nc4_path=path_to_nc4)
+dict_statistics = dataset_generator.generate_netCDF4_dataset(start, end, nc4_path=path_to_nc4, nbr_workers=nbr_workers)
+print("performed {} url requests, at {:.3f} requests per second".format(dict_statistics["number_of_requests"],
+                                                                        dict_statistics["requests_per_s"]))
@@ -0,0 +1,131 @@
+"""Parsers for the answers of the Kartverket tideapi stationdata requests, i.e. documents
+following the schema:
+
+<tide>
+<stationdata>
+<location name="OSLO" code="OSL" latitude="59.908559" longitude="10.734510">
+<data type="observation" unit="cm" reflevelcode="CD">
+<waterlevel value="27.3" time="2008-12-15T09:00:00+00:00" flag="obs"/>
+...
+</data>
+<data type="prediction" unit="cm" reflevelcode="CD">
+<waterlevel value="56.1" time="2008-12-15T09:00:00+00:00" flag="pre"/>
+...
+</data>
+</location>
+</stationdata>
+</tide>
+
+The fast parser streams through the document with lxml iterparse, and converts each
+dataset at once into typed numpy arrays. The BeautifulSoup parser is kept as a fallback,
+in case lxml is not available or the document is not well formed XML.
+"""
+
+import io
+import logging
+
+import numpy as np
+
+import bs4
+from bs4 import BeautifulSoup as bfls
+
+try:
+    from lxml import etree
+except ImportError:
+    etree = None
+
+from kartverket_stormsurge.helper.datetimes import iso_utc_strings_to_timestamps
+
+
+def data_key(data_type, data_unit, data_reflevelcode):
+    """The key used for each dataset of a segment, for example 'observation_cm_CD'."""
+    return "{}_{}_{}".format(data_type, data_unit, data_reflevelcode)
+
+
+def to_typed_arrays(list_times, list_values):
+    """Convert the raw time and value strings of a dataset into (np_timestamps, np_values),
+    an int64 array of POSIX timestamps and a float32 array."""
+    return (iso_utc_strings_to_timestamps(list_times), np.array(list_values, dtype=np.float32))
+
+
+def parse_stationdata_lxml(html_string):
+    """Parse the answer to a stationdata request with a streaming lxml iterparse.
+    See parse_stationdata for the input and output."""
+
+    if etree is None:
+        raise ImportError("lxml is not available")
+
+    if isinstance(html_string, str):
+        html_string = html_string.encode("utf-8")
+
+    dict_segment = {}
+
+    crrt_key = None
+    list_times = []
+    list_values = []
+
+    for event, element in etree.iterparse(io.BytesIO(html_string), events=("start", "end"),
+                                          tag=("data", "waterlevel")):
+        if element.tag == "waterlevel":
+            if event == "end":
+                list_times.append(element.get("time"))
+                list_values.append(element.get("value"))
+                element.clear()
+
+        elif event == "start":
+            crrt_key = data_key(element.get("type"), element.get("unit"), element.get("reflevelcode"))
+            list_times = []
+            list_values = []
+
+        else:
+            dict_segment[crrt_key] = to_typed_arrays(list_times, list_values)
+            element.clear()
+
+    return(dict_segment)
+
+
+def parse_stationdata_bs4(html_string):
+    """Parse the answer to a stationdata request with BeautifulSoup. This is much slower than
+    parse_stationdata_lxml, but more lenient. See parse_stationdata for the input and output."""
+
+    soup = bfls(html_string, features="lxml")
+
+    dict_segment = {}
+
+    for crrt_dataset in soup.findAll("data"):
+        crrt_key = data_key(crrt_dataset["type"], crrt_dataset["unit"], crrt_dataset["reflevelcode"])
+
+        list_times = []
+        list_values = []
+
+        # individual entries are specific tags; note that the string content of each tag is empty, the data
+        # is in the tag specification itself.
+        for crrt_entry in crrt_dataset:
+            # effectively ignores the empty string contents, grab data from the tags
+            if type(crrt_entry) is bs4.element.Tag:
+                list_times.append(crrt_entry["time"])
+                list_values.append(crrt_entry["value"])
+
+        dict_segment[crrt_key] = to_typed_arrays(list_times, list_values)
+
+    return(dict_segment)
+
+
+def parse_stationdata(html_string):
+    """Parse the answer to a stationdata request, using the fast lxml parser if possible,
+    and falling back to BeautifulSoup otherwise.
+    Input:
+        - html_string: the raw answer to the request, bytes or str.
+    Output:
+        - a dict, with keys "{type}_{unit}_{reflevelcode}" for each data tag in the answer
+            (for example "observation_cm_CD"), and values (np_timestamps, np_values), i.e.
+            an int64 array of POSIX timestamps and a float32 array of the corresponding values.
+    """
+
+    if etree is not None:
+        try:
+            return parse_stationdata_lxml(html_string)
+        except etree.XMLSyntaxError as crrt_exception:
+            logging.warning("fast parsing failed with {}, fall back on BeautifulSoup".format(crrt_exception))
+
+    return parse_stationdata_bs4(html_string)
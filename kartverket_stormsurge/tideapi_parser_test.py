@@ -0,0 +1,72 @@
+"""Tests of the stationdata parsers, against the answer of a request done by hand
+(see dataset_generator_accessor_test.py)."""
+
+import datetime
+import numpy as np
+import pytz
+
+from kartverket_stormsurge.tideapi_parser import parse_stationdata, parse_stationdata_lxml, parse_stationdata_bs4
+from kartverket_stormsurge.helper.synthetic_dataset import synthetic_stationdata_xml
+
+html_string = b"""<?xml version="1.0" encoding="UTF-8"?>
+<tide>
+<stationdata>
+<location name="OSLO" code="OSL" latitude="59.908559" longitude="10.734510">
+<data type="observation" unit="cm" reflevelcode="CD">
+<waterlevel value="27.3" time="2008-12-15T09:00:00+00:00" flag="obs"/>
+<waterlevel value="26.4" time="2008-12-15T09:10:00+00:00" flag="obs"/>
+<waterlevel value="25.6" time="2008-12-15T09:20:00+00:00" flag="obs"/>
+</data>
+<data type="prediction" unit="cm" reflevelcode="CD">
+<waterlevel value="56.1" time="2008-12-15T09:00:00+00:00" flag="pre"/>
+<waterlevel value="54.8" time="2008-12-15T09:10:00+00:00" flag="pre"/>
+</data>
+</location>
+</stationdata>
+</tide>
+"""
+
+
+def check_parsed(dict_segment):
+    assert sorted(dict_segment.keys()) == ["observation_cm_CD", "prediction_cm_CD"]
+
+    np_timestamps, np_values = dict_segment["observation_cm_CD"]
+    assert np_timestamps.dtype == np.int64
+    assert np_values.dtype == np.float32
+    assert list(np_timestamps) == [datetime.datetime(2008, 12, 15, 9, crrt_minute, 0, tzinfo=pytz.utc).timestamp()
+                                   for crrt_minute in [0, 10, 20]]
+    assert np.allclose(np_values, [27.3, 26.4, 25.6])
+
+    np_timestamps, np_values = dict_segment["prediction_cm_CD"]
+    assert len(np_timestamps) == 2
+    assert np.allclose(np_values, [56.1, 54.8])
+
+
+def test_parse_stationdata_lxml():
+    check_parsed(parse_stationdata_lxml(html_string))
+    check_parsed(parse_stationdata_lxml(html_string.decode("utf-8")))
+
+
+def test_parse_stationdata_bs4():
+    check_parsed(parse_stationdata_bs4(html_string))
+
+
+def test_parse_stationdata_fallback():
+    # not well formed XML, the fast parser fails and BeautifulSoup takes over
+    check_parsed(parse_stationdata(html_string.replace(b"</stationdata>", b"")))
+
+    assert parse_stationdata(b"") == {}
+
+
+def test_parsers_agree():
+    html_string_synthetic = synthetic_stationdata_xml("OSL",
+                                                      datetime.datetime(2008, 1, 1, 0, 0, tzinfo=pytz.utc),
+                                                      datetime.datetime(2008, 1, 6, 0, 0, tzinfo=pytz.utc))
+
+    dict_segment_lxml = parse_stationdata_lxml(html_string_synthetic)
+    dict_segment_bs4 = parse_stationdata_bs4(html_string_synthetic)
+
+    for crrt_key in ["observation_cm_CD", "prediction_cm_CD"]:
+        assert len(dict_segment_lxml[crrt_key][0]) == 6 * 24 * 5 + 1
+        assert np.array_equal(dict_segment_lxml[crrt_key][0], dict_segment_bs4[crrt_key][0])
+        assert np.array_equal(dict_segment_lxml[crrt_key][1], dict_segment_bs4[crrt_key][1])